@@ -5,7 +5,7 @@ Sleek hero section with scroll animations, feature cards, and CTAs.
 
 import streamlit as st
 from utils.styles import inject_custom_css, inject_page_animations
-from utils.db import init_auth_db, seed_default_users
+from utils.resources import bootstrap_auth_db
 from utils.auth import init_session_state, is_authenticated
 
 # ─── Page Config ────────────────────────────────────────────
@@ -17,8 +17,7 @@ st.set_page_config(
 )
 
 # ─── Initialize ─────────────────────────────────────────────
-init_auth_db()
-seed_default_users()
+bootstrap_auth_db()
 init_session_state()
 inject_custom_css()
 
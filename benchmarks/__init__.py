@@ -0,0 +1 @@
+# SecureVault Benchmarks Package
@@ -0,0 +1,135 @@
+"""
+SecureVault — Login Path Benchmark
+Measures the auth database work of one login (get_user + record_login +
+update_last_login), through the utils/db.py connection pool and, for
+comparison, with a fresh connection per call as before the pool existed.
+
+    python -m benchmarks.login
+    python -m benchmarks.login --logins 5000 --users 1000 --output login.json
+
+Password hashing is left out: PBKDF2 costs the same either way and would
+hide the database time. The run uses a scratch auth database in a
+temporary directory (via SECUREVAULT_AUTH_DB), never the working tree's.
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.run import REPO_ROOT, latency_summary
+
+DEFAULT_LOGINS = 2000
+DEFAULT_USERS = 100
+DEFAULT_SEED = 42
+
+
+# ─── Login Paths ────────────────────────────────────────────
+
+def pooled_login(db, username: str, role: str):
+    """One successful login as utils/auth.login() issues it."""
+    user = db.get_user(username, role)
+    db.record_login(user["id"], username, role, "success")
+    db.update_last_login(user["id"])
+
+
+def connect_per_call_login(path: str, username: str, role: str):
+    """The same three statements, each on its own connection."""
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    row = conn.execute("SELECT * FROM users WHERE username = ? AND role = ?",
+                       (username, role)).fetchone()
+    conn.close()
+    user = dict(row)
+
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        """INSERT INTO login_logs (user_id, username, role, login_time, ip_address, status)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        (user["id"], username, role, now, "127.0.0.1", "success")
+    )
+    conn.commit()
+    conn.close()
+
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE users SET last_login = ? WHERE id = ?", (now, user["id"]))
+    conn.commit()
+    conn.close()
+
+
+def time_logins(login, usernames: list, logins: int, seed: int) -> dict:
+    """Latency summary of `logins` calls over randomly chosen users."""
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(logins):
+        username = rng.choice(usernames)
+        start = time.perf_counter()
+        login(username, "user")
+        samples.append(time.perf_counter() - start)
+    return {
+        "logins_per_second": round(len(samples) / sum(samples), 1),
+        **latency_summary(samples),
+    }
+
+
+# ─── Orchestration ──────────────────────────────────────────
+
+def run(logins: int, users: int, seed: int) -> dict:
+    with tempfile.TemporaryDirectory(prefix="securevault-login-") as scratch:
+        path = os.path.join(scratch, "auth.db")
+        # utils.db binds its pools to AUTH_DB at import time.
+        os.environ["SECUREVAULT_AUTH_DB"] = path
+        sys.path.insert(0, REPO_ROOT)
+        from utils import db
+
+        db.init_auth_db()
+        pw_hash, salt = db.hash_password("bench")
+        usernames = [f"bench_user_{i}" for i in range(users)]
+        with db._writer_pool.connection() as conn:
+            conn.executemany(
+                "INSERT INTO users (username, password_hash, password_salt, role) VALUES (?, ?, ?, 'user')",
+                [(username, pw_hash, salt) for username in usernames]
+            )
+            conn.commit()
+
+        result = {"logins": logins, "users": users, "seed": seed}
+        result["connect_per_call"] = time_logins(
+            lambda username, role: connect_per_call_login(path, username, role),
+            usernames, logins, seed
+        )
+        result["pooled"] = time_logins(
+            lambda username, role: pooled_login(db, username, role),
+            usernames, logins, seed
+        )
+        db._writer_pool.close()
+        db._reader_pool.close()
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.login")
+    parser.add_argument("--logins", type=int, default=DEFAULT_LOGINS)
+    parser.add_argument("--users", type=int, default=DEFAULT_USERS)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--output", help="results file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    result = run(args.logins, args.users, args.seed)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,328 @@
+"""
+SecureVault — Engine Benchmarks
+Measures ingest throughput, search latency by term frequency, on-disk size
+and peak memory of the vault engine at configurable dataset sizes.
+
+    python -m benchmarks.run --sizes 10000,100000
+    python -m benchmarks.run --sizes 10000 --compare benchmarks/results/baseline.json
+
+Every dataset size runs in a fresh subprocess inside a temporary directory,
+so keys, database files and peak RSS never leak between sizes or into the
+working tree.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from benchmarks.synthetic import DEFAULT_SEED, account_number, generate_customers
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+DEFAULT_SIZES = [10_000, 100_000]
+SINGLE_INSERTS = 1000
+MICRO_OPS = 5000
+SEARCH_QUERIES = 50
+SEARCH_TIME_BUDGET = 5.0
+TOP_K = 20
+DECRYPT_ROWS = (1000, 5000, 20_000)
+DECRYPT_REPEATS = 3
+
+
+# ─── Helpers ────────────────────────────────────────────────
+
+def percentile(samples: list, pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list of samples."""
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def latency_summary(samples: list) -> dict:
+    """p50/p99/max in milliseconds."""
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1e3, 4),
+        "p99_ms": round(percentile(samples, 99) * 1e3, 4),
+        "max_ms": round(max(samples) * 1e3, 4),
+    }
+
+
+def ops_per_second(fn, args: list) -> float:
+    start = time.perf_counter()
+    for arg in args:
+        fn(arg)
+    return round(len(args) / (time.perf_counter() - start), 1)
+
+
+# ─── Single-Size Run (child process) ────────────────────────
+
+def bench_micro(sv) -> dict:
+    """Per-call cost of the primitives every insert and search pays."""
+    sv.generate_trapdoor.cache_clear()
+    words = [f"word{i}" for i in range(MICRO_OPS)]
+    records = list(generate_customers(MICRO_OPS, seed=1))
+    blobs = [sv.encrypt_payload(record) for record in records]
+    return {
+        "generate_trapdoor_ops": ops_per_second(sv.generate_trapdoor, words),
+        "encrypt_payload_ops": ops_per_second(sv.encrypt_payload, records),
+        "decrypt_payload_ops": ops_per_second(sv.decrypt_payload, blobs),
+    }
+
+
+def bench_decrypt(sv) -> dict:
+    """Cold-cache load_records() time, serial and on 2, 4 and cpu_count
+    workers of each executor, to place PARALLEL_DECRYPT_THRESHOLD on this
+    host. Pools are warmed first, as decrypt_pool() keeps them alive between
+    queries. A crossover is the smallest row count from which that executor
+    beats serial at every larger size too, or None when it never does."""
+    worker_counts = sorted({2, 4, os.cpu_count() or 1} - {1})
+    records = list(generate_customers(max(DECRYPT_ROWS), seed=2))
+    rows = [(record["acc_no"], sv.encrypt_payload(record)) for record in records]
+
+    def best_of(workers: int, executor: str, n: int) -> float:
+        best = float("inf")
+        for _ in range(DECRYPT_REPEATS):
+            sv.record_cache.clear()
+            start = time.perf_counter()
+            sv.load_records("decrypt-bench", rows[:n], workers, threshold=0, executor=executor)
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    timings = {n: {"serial": best_of(1, "thread", n)} for n in DECRYPT_ROWS}
+    crossovers = {}
+    for executor in sv.INGEST_EXECUTORS:
+        for workers in worker_counts:
+            best_of(workers, executor, 1)
+            for n in DECRYPT_ROWS:
+                timings[n][f"{executor}_{workers}"] = best_of(workers, executor, n)
+        crossover = None
+        for n in reversed(DECRYPT_ROWS):
+            fastest = min(timings[n][f"{executor}_{w}"] for w in worker_counts)
+            if fastest >= timings[n]["serial"]:
+                break
+            crossover = n
+        crossovers[executor] = crossover
+    return {
+        "cpu_count": os.cpu_count(),
+        "crossover_rows": crossovers,
+        **{f"rows_{n}": {f"{name}_ms": round(t * 1e3, 2) for name, t in by_run.items()}
+           for n, by_run in timings.items()},
+    }
+
+
+def time_queries(sv, terms: list, fn) -> tuple:
+    """Run fn over terms (cold record cache) within the time budget.
+    Returns (latency samples, result of the last call)."""
+    samples = []
+    result = None
+    deadline = time.perf_counter() + SEARCH_TIME_BUDGET
+    for i in range(SEARCH_QUERIES):
+        if samples and time.perf_counter() > deadline:
+            break
+        term = terms[i % len(terms)]
+        sv.record_cache.clear()
+        start = time.perf_counter()
+        result = fn(term)
+        samples.append(time.perf_counter() - start)
+    return samples, result
+
+
+def bench_search(sv, conn, frequencies: Counter, size: int) -> dict:
+    """Cold-cache latency of full searches, top-k searches and count-only
+    queries for the most common name token, one whose frequency is the
+    geometric mean of the extremes, and the rarest, plus unique account
+    numbers."""
+    ranked = [term for term, _ in frequencies.most_common()]
+    # Most tokens sit in the long tail, so the median-ranked one is as rare
+    # as the rarest; "medium" is picked by frequency instead.
+    middle = math.sqrt(frequencies[ranked[0]] * frequencies[ranked[-1]])
+    bands = {
+        "high": [ranked[0]],
+        "medium": [min(ranked, key=lambda term: abs(math.log(frequencies[term] / middle)))],
+        "low": [ranked[-1]],
+        "unique": [account_number(i) for i in range(0, size, max(1, size // SEARCH_QUERIES))],
+    }
+
+    results = {}
+    for band, terms in bands.items():
+        samples, records = time_queries(sv, terms, lambda term: sv.search_records(conn, term))
+        top_k, _ = time_queries(sv, terms, lambda term: sv.search_records(conn, term, limit=TOP_K))
+        count, _ = time_queries(sv, terms, lambda term: sv.count_matches(conn, term))
+        results[band] = {
+            "term_frequency": frequencies.get(terms[0], 1),
+            "results": len(records),
+            **latency_summary(samples),
+            f"top_{TOP_K}": latency_summary(top_k),
+            "count": latency_summary(count),
+        }
+    return results
+
+
+def run_single(size: int, seed: int, workers: int) -> dict:
+    # Importing securevault touches no files, but its keys and database are
+    # created relative to the working directory on first use, and each size
+    # runs in its own scratch directory. Importing it here, inside that child
+    # process, keeps module state (caches, metrics) per size as well.
+    sys.path.insert(0, REPO_ROOT)
+    import securevault as sv
+
+    result = {"size": size, "seed": seed, "workers": workers}
+    result["micro"] = bench_micro(sv)
+    result["decrypt"] = bench_decrypt(sv)
+
+    conn = sv.init_db("bench.db")
+    singles = min(SINGLE_INSERTS, size // 10)
+    frequencies = Counter()
+
+    def counted(records):
+        for record in records:
+            frequencies.update(set(record["name"].split()))
+            yield record
+
+    start = time.perf_counter()
+    stats = sv.insert_records(conn, counted(generate_customers(size - singles, seed)),
+                              workers=workers)
+    elapsed = time.perf_counter() - start
+    result["bulk_ingest"] = {
+        "records": stats["inserted"],
+        "seconds": round(elapsed, 3),
+        "records_per_second": round(stats["inserted"] / elapsed, 1),
+    }
+
+    samples = []
+    for record in counted(generate_customers(singles, seed, start=size - singles)):
+        start = time.perf_counter()
+        sv.insert_record(conn, record)
+        samples.append(time.perf_counter() - start)
+    if samples:
+        result["single_insert"] = {
+            "records_per_second": round(len(samples) / sum(samples), 1),
+            **latency_summary(samples),
+        }
+
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    db_bytes = os.path.getsize("bench.db")
+    result["storage"] = {
+        "db_bytes": db_bytes,
+        "bytes_per_record": round(db_bytes / size, 1),
+    }
+
+    result["search"] = bench_search(sv, conn, frequencies, size)
+    conn.close()
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result["peak_rss_bytes"] = peak if sys.platform == "darwin" else peak * 1024
+    return result
+
+
+# ─── Orchestration ──────────────────────────────────────────
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def run_size(size: int, seed: int, workers: int) -> dict:
+    """Run one dataset size in a child process and return its results."""
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    with tempfile.TemporaryDirectory(prefix="securevault-bench-") as scratch:
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run", "--single", str(size),
+             "--seed", str(seed), "--workers", str(workers)],
+            cwd=scratch, env=env, capture_output=True, text=True
+        )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        raise RuntimeError(f"Benchmark at size {size} failed")
+    return json.loads(proc.stdout)
+
+
+def flatten(result: dict, prefix: str = "") -> dict:
+    """Numeric leaves of a result keyed by dotted path."""
+    flat = {}
+    for key, value in result.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(baseline: dict, current: dict):
+    """Print every metric of runs present in both files with its change."""
+    previous = {run["size"]: flatten(run) for run in baseline["results"]}
+    for run in current["results"]:
+        if run["size"] not in previous:
+            continue
+        print(f"\nsize {run['size']:,}")
+        old = previous[run["size"]]
+        for path, value in flatten(run).items():
+            if path in ("size", "seed", "workers") or path not in old:
+                continue
+            change = (value - old[path]) / old[path] * 100 if old[path] else 0.0
+            print(f"  {path:<40} {old[path]:>16,.2f} {value:>16,.2f} {change:>+8.1f}%")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated record counts")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="insert_records() preparation workers")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results file to diff against")
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.single is not None:
+        json.dump(run_single(args.single, args.seed, args.workers), sys.stdout)
+        return 0
+
+    report = {"environment": environment(), "results": []}
+    for size in (int(s.replace("_", "")) for s in args.sizes.split(",")):
+        print(f"Benchmarking {size:,} records...", file=sys.stderr)
+        report["results"].append(run_size(size, args.seed, args.workers))
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+SecureVault — Synthetic Customer Generator
+Deterministic stream of customer records whose name tokens follow a Zipf
+distribution, so a few surnames are very common and most are rare.
+"""
+
+import random
+from functools import lru_cache
+from itertools import accumulate, product
+
+FIRST_NAMES = [
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda",
+    "William", "Elizabeth", "David", "Barbara", "Richard", "Susan", "Joseph", "Jessica",
+    "Thomas", "Sarah", "Charles", "Karen", "Priya", "Rahul", "Anita", "Vikram",
+    "Aisha", "Omar", "Fatima", "Yusuf", "Wei", "Mei", "Hiroshi", "Yuki",
+    "Carlos", "Maria", "Jose", "Lucia", "Ivan", "Olga", "Dmitri", "Elena",
+    "Kwame", "Amara", "Chidi", "Ngozi", "Lars", "Ingrid", "Pierre", "Amelie",
+    "Giovanni", "Giulia", "Sven", "Astrid", "Mateo", "Valentina", "Arjun", "Deepa",
+    "Kenji", "Sakura", "Tariq", "Leila", "Noah", "Emma", "Liam", "Olivia",
+]
+
+SURNAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis",
+    "Rodriguez", "Martinez", "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson",
+    "Thomas", "Taylor", "Moore", "Jackson", "Martin", "Lee", "Perez", "Thompson",
+    "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson", "Walker",
+    "Young", "Allen", "King", "Wright", "Scott", "Torres", "Nguyen", "Hill",
+    "Flores", "Green", "Adams", "Nelson", "Baker", "Hall", "Rivera", "Campbell",
+    "Mitchell", "Carter", "Roberts", "Sharma", "Patel", "Singh", "Kumar", "Gupta",
+    "Khan", "Ali", "Ahmed", "Wang", "Li", "Zhang", "Liu", "Chen", "Yang", "Huang",
+    "Tanaka", "Suzuki", "Sato", "Kim", "Park", "Choi", "Ivanov", "Petrov",
+    "Novak", "Kowalski", "Muller", "Schmidt", "Schneider", "Fischer", "Weber",
+    "Rossi", "Russo", "Ferrari", "Esposito", "Bianchi", "Dubois", "Moreau",
+    "Laurent", "Okafor", "Mensah", "Abubakar", "Hansen", "Johansson", "Nielsen",
+    "Silva", "Santos", "Oliveira", "Pereira", "Costa", "Fernandes", "Reddy",
+    "Iyer", "Menon", "Nair", "Bose", "Das", "Chatterjee", "Mukherjee", "Joshi",
+]
+
+# Real surnames are the head of the distribution; behind them sits a long
+# tail of made-up two-syllable surnames, so large datasets contain genuinely
+# rare terms (held by one or a handful of customers) as they would in life.
+SURNAME_TAIL = 100_000
+_ONSETS = ["b", "d", "f", "g", "h", "k", "l", "m", "n", "p", "r", "s", "t",
+           "v", "z", "ch", "sh", "th"]
+_VOWELS = ["a", "e", "i", "o", "u"]
+_CODAS = ["", "n", "r", "l", "s"]
+
+ZIPF_EXPONENT = 1.07
+DEFAULT_SEED = 42
+
+
+@lru_cache(maxsize=None)
+def surnames() -> tuple:
+    """SURNAMES followed by SURNAME_TAIL generated ones, in a fixed order."""
+    syllables = ["".join(parts) for parts in product(_ONSETS, _VOWELS, _CODAS)]
+    known = {name.lower() for name in SURNAMES + FIRST_NAMES}
+    # Different syllable splits can spell the same name; keep the first.
+    tail = [name for name in dict.fromkeys(a + b for a, b in product(syllables, repeat=2))
+            if name not in known]
+    random.Random(0).shuffle(tail)
+    return tuple(SURNAMES) + tuple(name.capitalize() for name in tail[:SURNAME_TAIL])
+
+
+def _zipf_weights(n: int, exponent: float = ZIPF_EXPONENT) -> list:
+    """Cumulative Zipf weights for ranks 1..n."""
+    return list(accumulate(1.0 / rank ** exponent for rank in range(1, n + 1)))
+
+
+def account_number(i: int) -> str:
+    """Account number of the i-th generated customer."""
+    return f"ACC{i:010d}"
+
+
+def generate_customers(count: int, seed: int = DEFAULT_SEED, start: int = 0):
+    """
+    Yield `count` customer records. The same (count, seed, start) always
+    yields the same records, independent of Python's hash seed.
+    """
+    rng = random.Random(seed * 1_000_003 + start)
+    first_weights = _zipf_weights(len(FIRST_NAMES))
+    last_names = surnames()
+    last_weights = _zipf_weights(len(last_names))
+
+    for i in range(start, start + count):
+        first = rng.choices(FIRST_NAMES, cum_weights=first_weights)[0]
+        last = rng.choices(last_names, cum_weights=last_weights)[0]
+        yield {
+            "name": f"{first} {last}",
+            "acc_no": account_number(i),
+            "balance": f"{rng.lognormvariate(8.0, 1.5):.2f}",
+        }
+
@@ -7,7 +7,7 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 from utils.styles import inject_custom_css, inject_page_animations
-from utils.db import init_auth_db, seed_default_users, get_login_logs, get_login_stats, get_all_users
+from utils.resources import bootstrap_auth_db, login_logs, login_stats, all_users
 from utils.auth import init_session_state, login, logout, is_authenticated, get_current_user
 
 # ─── Page Config ────────────────────────────────────────────
@@ -17,8 +17,7 @@ st.set_page_config(
     layout="wide"
 )
 
-init_auth_db()
-seed_default_users()
+bootstrap_auth_db()
 init_session_state()
 inject_custom_css()
 
@@ -122,7 +121,7 @@ if not is_authenticated("admin"):
 # ═══════════════════════════════════════════════════════════
 
 user = get_current_user()
-stats = get_login_stats()
+stats = login_stats()
 
 # ─── Header ─────────────────────────────────────────────────
 st.markdown(f"""
@@ -168,10 +167,11 @@ with tab_logs:
     with filter_cols[3]:
         st.markdown("<br>", unsafe_allow_html=True)
         if st.button("🔄 Refresh", key="refresh_logs", use_container_width=True):
+            login_logs.clear()
             st.rerun()
 
     # Fetch and filter logs
-    logs = get_login_logs(200)
+    logs = login_logs(200)
 
     if filter_role != "All":
         logs = [l for l in logs if l["role"] == filter_role]
@@ -207,7 +207,7 @@ with tab_logs:
 with tab_users:
     st.markdown('<div style="margin-bottom: 1rem; animation: fadeInUp 0.7s ease-out both;"><div style="color: #d0d0d0; font-weight: 600; font-size: 1.17rem; margin-bottom: 0.3rem;">Registered Users</div><div style="color: #a0a0a0; font-size: 0.88rem;">Overview of all user accounts in the system.</div></div>', unsafe_allow_html=True)
 
-    users = get_all_users()
+    users = all_users()
 
     if users:
         user_cards = ""
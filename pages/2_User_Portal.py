@@ -6,7 +6,7 @@ User login + account dashboard with details, login history, and 2FA placeholder.
 import streamlit as st
 from datetime import datetime
 from utils.styles import inject_custom_css, inject_page_animations
-from utils.db import init_auth_db, seed_default_users, get_user_login_history
+from utils.resources import bootstrap_auth_db, user_login_history
 from utils.auth import init_session_state, login, logout, is_authenticated, get_current_user
 
 # ─── Page Config ────────────────────────────────────────────
@@ -16,8 +16,7 @@ st.set_page_config(
     layout="wide"
 )
 
-init_auth_db()
-seed_default_users()
+bootstrap_auth_db()
 init_session_state()
 inject_custom_css()
 
@@ -310,7 +309,7 @@ with tab_history:
     </div>
     """, unsafe_allow_html=True)
 
-    history = get_user_login_history(user["username"], 20)
+    history = user_login_history(user["username"], 20)
 
     if history:
         # Table header
@@ -1,32 +1,67 @@
 import os
+import base64
 import sqlite3
 import json
 import hmac
 import hashlib
+import heapq
 import logging
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives.kdf.hkdf import HKDF
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.backends import default_backend
-import streamlit as st
+import mmap
+import struct
+import sys
+import math
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from utils.storage import apply_storage_profile, start_checkpoint_scheduler
+from utils.metrics import registry as metrics_registry, instrument, uninstrument, serve_metrics
 
 # =====================================================
 # CONFIGURATION & LOGGING
 # =====================================================
-
-logging.basicConfig(
-    filename="securevault.log",
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(message)s"
-)
+#
+# This module is the engine and can be imported by batch jobs and workers:
+# importing it reads no files, derives no keys and does not load Streamlit
+# or cryptography. The Streamlit UI lives in securevault_ui.py, the
+# import/backup/restore commands in securevault_cli.py and online backup in
+# utils/backup.py.
 
 DB_FILE = "securevault.db"
 ROOT_KEY_FILE = "root.key"
 SALT_FILE = "salt.bin"
+LOG_FILE = "securevault.log"
+
+def configure_logging():
+    # Called by the UI and CLI entry points; library users keep their own
+    # logging setup.
+    logging.basicConfig(
+        filename=LOG_FILE,
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(message)s"
+    )
 
 # =====================================================
 # KEY HIERARCHY (Industry Standard)
 # =====================================================
+#
+# The root key and every derived key are loaded on first use and cached.
+
+KEY_CONTEXTS = {
+    "encryption": b"encryption-key",
+    "trapdoor": b"trapdoor-key",
+    "index-integrity": b"index-integrity-key",
+    "ngram": b"ngram-trapdoor-key",
+    "range": b"range-bucket-key",
+    "shard": b"shard-routing-key",
+    "backup": b"backup-encryption-key",
+    "backup-page": b"backup-page-hash-key",
+}
 
 def load_or_generate_root_key():
     if not os.path.exists(ROOT_KEY_FILE):
@@ -38,9 +73,15 @@ def load_or_generate_root_key():
             key = f.read()
     return key
 
-ROOT_KEY = load_or_generate_root_key()
+@lru_cache(maxsize=None)
+def root_key() -> bytes:
+    return load_or_generate_root_key()
+
+def derive_key(context: bytes, material: bytes = None) -> bytes:
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.backends import default_backend
 
-def derive_key(context: bytes) -> bytes:
     hkdf = HKDF(
         algorithm=hashes.SHA256(),
         length=32,
@@ -48,13 +89,78 @@ def derive_key(context: bytes) -> bytes:
         info=context,
         backend=default_backend()
     )
-    return hkdf.derive(ROOT_KEY)
+    return hkdf.derive(root_key() if material is None else material)
 
-K_ENC = derive_key(b"encryption-key")
-K_TD  = derive_key(b"trapdoor-key")
-K_IDX = derive_key(b"index-integrity-key")
+@lru_cache(maxsize=None)
+def get_key(name: str) -> bytes:
+    return derive_key(KEY_CONTEXTS[name])
 
-cipher = Fernet(base64_urlsafe_key := Fernet.generate_key())
+def invalid_token_error() -> type:
+    # Used as `except invalid_token_error():` so cryptography is imported
+    # only when an exception actually reaches the handler.
+    from cryptography.fernet import InvalidToken
+    return InvalidToken
+
+# =====================================================
+# VERSIONED DATA-ENCRYPTION KEYS
+# =====================================================
+#
+# Every payload blob is one key-version byte followed by a Fernet token.
+# Data keys are derived from the encryption key per version, so any process holding the
+# root key can read every version and no key material is stored per version.
+
+KEY_VERSION_FILE = "key.version"
+MAX_KEY_VERSION = 100  # stays clear of b"g", the first byte of a bare Fernet token
+
+def load_or_init_key_version() -> int:
+    if not os.path.exists(KEY_VERSION_FILE):
+        with open(KEY_VERSION_FILE, "w") as f:
+            f.write("1")
+        return 1
+    with open(KEY_VERSION_FILE) as f:
+        return int(f.read().strip())
+
+ACTIVE_KEY_VERSION = None  # read from KEY_VERSION_FILE on first use
+_KEY_VERSION_STAT = None  # (inode, mtime_ns, size) of the file ACTIVE_KEY_VERSION came from
+
+def _key_version_stat():
+    try:
+        st = os.stat(KEY_VERSION_FILE)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+def active_key_version() -> int:
+    # Re-read whenever KEY_VERSION_FILE changes, so a rotation started by
+    # another process moves this one's writes to the new version too.
+    global ACTIVE_KEY_VERSION, _KEY_VERSION_STAT
+    stat = _key_version_stat()
+    if ACTIVE_KEY_VERSION is None or stat is None or stat != _KEY_VERSION_STAT:
+        ACTIVE_KEY_VERSION = load_or_init_key_version()
+        _KEY_VERSION_STAT = _key_version_stat()
+    return ACTIVE_KEY_VERSION
+
+def set_active_key_version(version: int):
+    global ACTIVE_KEY_VERSION, _KEY_VERSION_STAT
+    if not 1 <= version <= MAX_KEY_VERSION:
+        raise ValueError(f"Key version must be between 1 and {MAX_KEY_VERSION}")
+    # Replaced atomically: a concurrent reader sees the old version or the new one.
+    tmp = f"{KEY_VERSION_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(str(version))
+    os.replace(tmp, KEY_VERSION_FILE)
+    ACTIVE_KEY_VERSION = version
+    _KEY_VERSION_STAT = _key_version_stat()
+    logging.info(f"Active data key version set to {version}")
+
+@lru_cache(maxsize=None)
+def get_cipher(version: int):
+    from cryptography.fernet import Fernet, InvalidToken
+
+    if not 1 <= version <= MAX_KEY_VERSION:
+        raise InvalidToken
+    data_key = derive_key(f"data-key:v{version}".encode(), get_key("encryption"))
+    return Fernet(base64.urlsafe_b64encode(data_key))
 
 # =====================================================
 # SALT MANAGEMENT
@@ -70,23 +176,180 @@ def load_or_generate_salt():
             salt = f.read()
     return salt
 
-GLOBAL_SALT = load_or_generate_salt()
+@lru_cache(maxsize=None)
+def global_salt() -> bytes:
+    return load_or_generate_salt()
 
 # =====================================================
 # SECURE TRAPDOOR (Blind Index)
 # =====================================================
 
-def generate_trapdoor(word: str) -> str:
-    normalized = word.lower().strip().encode()
-    data = GLOBAL_SALT + normalized
-    return hmac.new(K_TD, data, hashlib.sha256).hexdigest()
+TRAPDOOR_CACHE_SIZE = 100_000
+
+@lru_cache(maxsize=None)
+def keyed_hmac(key_name: str):
+    # HMAC keyed with the named key and already fed the global salt; each
+    # trapdoor copies this state instead of re-running key setup and
+    # re-hashing the salt.
+    return hmac.new(get_key(key_name), global_salt(), hashlib.sha256)
+
+@lru_cache(maxsize=TRAPDOOR_CACHE_SIZE)
+def generate_trapdoor(word: str) -> bytes:
+    h = keyed_hmac("trapdoor").copy()
+    h.update(word.lower().strip().encode())
+    return h.digest()
+
+def generate_trapdoors(terms) -> list:
+    return [generate_trapdoor(term) for term in terms]
+
+# =====================================================
+# BLIND N-GRAM TRAPDOORS (Prefix Search)
+# =====================================================
+#
+# Each name token gets edge-prefix grams from PREFIX_MIN_LENGTH up to
+# PREFIX_MAX_LENGTH characters. Longer prefixes are answered by adding
+# trigrams from the token's tail and checking candidates after decryption.
+# N-gram trapdoors use their own key so they can never equal an exact-term
+# trapdoor for the same string.
+#
+# The index is switched on per vault by build_ngram_index(), which records it
+# in vault_meta; every writer reads that row, so inserts from any process keep
+# the index complete.
+
+PREFIX_MIN_LENGTH = 3
+PREFIX_MAX_LENGTH = 8
+NGRAM_MAX_PER_RECORD = 64
+
+@lru_cache(maxsize=TRAPDOOR_CACHE_SIZE)
+def generate_ngram_trapdoor(kind: str, gram: str) -> bytes:
+    h = keyed_hmac("ngram").copy()
+    h.update(f"{kind}:{gram}".encode())
+    return h.digest()
+
+def tail_trigrams(token: str) -> list:
+    # Only trigrams overlapping the part past PREFIX_MAX_LENGTH are ever
+    # queried, so the head of the token is not trigram-indexed.
+    return [token[i:i + 3] for i in range(PREFIX_MAX_LENGTH - 2, len(token) - 2)]
+
+def term_ngrams(term: str) -> list:
+    token = term.lower().strip()
+    grams = [("p", token[:k])
+             for k in range(PREFIX_MIN_LENGTH, min(len(token), PREFIX_MAX_LENGTH) + 1)]
+    grams.extend(("t", gram) for gram in tail_trigrams(token))
+    return grams
+
+def index_ngrams(record: dict) -> set:
+    # Prefixes are kept ahead of trigrams when a record hits the
+    # NGRAM_MAX_PER_RECORD amplification cap.
+    prefixes, trigrams = [], []
+    for term in record["name"].split():
+        for kind, gram in term_ngrams(term):
+            (prefixes if kind == "p" else trigrams).append((kind, gram))
+    grams = list(dict.fromkeys(prefixes + trigrams))[:NGRAM_MAX_PER_RECORD]
+    return {generate_ngram_trapdoor(kind, gram) for kind, gram in grams}
+
+# =====================================================
+# BUCKETIZED RANGE TRAPDOORS
+# =====================================================
+#
+# Numeric fields are indexed at RANGE_LEVELS bucket resolutions. Level 0
+# buckets are RANGE_FIELDS[field] wide, and each level above is RANGE_FANOUT
+# times wider. A [lo, hi] query becomes a small set of aligned buckets
+# (at most 2 * (RANGE_FANOUT - 1) per level), and only the two partial edge
+# buckets return rows outside the range. Bucket labels are HMACs, so the
+# index shows which records share a bucket but not how buckets are ordered.
+#
+# The top level has RANGE_TOP_BUCKETS buckets centred on zero; values beyond
+# them share the outermost buckets. That bounds every cover, open-ended
+# (None or infinite) ones included, at RANGE_TOP_BUCKETS plus the edge
+# buckets of the levels below.
+
+RANGE_FIELDS = {"balance": 100.0}
+RANGE_FANOUT = 16
+RANGE_LEVELS = 6
+RANGE_TOP_BUCKETS = 256
+
+def generate_range_trapdoor(field: str, level: int, bucket: int) -> bytes:
+    h = keyed_hmac("range").copy()
+    h.update(f"{field}:{level}:{bucket}".encode())
+    return h.digest()
+
+def numeric_value(record: dict, field: str):
+    try:
+        return float(record.get(field))
+    except (TypeError, ValueError):
+        return None
+
+def range_bucket(field: str, value: float) -> int:
+    # Level-0 bucket of a value, clamped to the span of the top level.
+    span = RANGE_TOP_BUCKETS // 2 * RANGE_FANOUT ** (RANGE_LEVELS - 1)
+    scaled = value / RANGE_FIELDS[field]
+    if scaled >= span:
+        return span - 1
+    if scaled < -span:
+        return -span
+    return math.floor(scaled)
+
+def index_ranges(record: dict) -> set:
+    trapdoors = set()
+    for field in RANGE_FIELDS:
+        value = numeric_value(record, field)
+        if value is None or value != value or value in (float("inf"), float("-inf")):
+            continue
+        bucket = range_bucket(field, value)
+        for level in range(RANGE_LEVELS):
+            trapdoors.add(generate_range_trapdoor(field, level, bucket))
+            bucket //= RANGE_FANOUT
+    return trapdoors
+
+def range_cover(field: str, lo: float = None, hi: float = None) -> list:
+    # None leaves that end of the range open.
+    lo = -math.inf if lo is None else lo
+    hi = math.inf if hi is None else hi
+    if math.isnan(lo) or math.isnan(hi):
+        raise ValueError("Range bounds must not be NaN")
+    first, last = range_bucket(field, lo), range_bucket(field, hi)
+    trapdoors = []
+    for level in range(RANGE_LEVELS):
+        if first > last:
+            break
+        if level == RANGE_LEVELS - 1:
+            trapdoors.extend(generate_range_trapdoor(field, level, b)
+                             for b in range(first, last + 1))
+            break
+        while first % RANGE_FANOUT and first <= last:
+            trapdoors.append(generate_range_trapdoor(field, level, first))
+            first += 1
+        while (last + 1) % RANGE_FANOUT and first <= last:
+            trapdoors.append(generate_range_trapdoor(field, level, last))
+            last -= 1
+        first, last = first // RANGE_FANOUT, (last + 1) // RANGE_FANOUT - 1
+    return trapdoors
+
+def index_entries(record: dict, ngrams: bool = False) -> dict:
+    # Trapdoors to write per index table for one record. ngrams adds the
+    # optional n-gram index: pass ngram_index_enabled() when writing, and True
+    # when removing a record's postings, whatever the vault's setting.
+    entries = {"search_index": set(generate_trapdoors(index_terms(record)))}
+    if ngrams:
+        entries["ngram_index"] = index_ngrams(record)
+    if RANGE_FIELDS:
+        entries["range_index"] = index_ranges(record)
+    return entries
 
 # =====================================================
 # DATABASE LAYER
 # =====================================================
 
-def init_db():
-    conn = sqlite3.connect(DB_FILE)
+SCHEMA_VERSION = 1
+
+def init_db(path: str = None, check_same_thread: bool = True):
+    path = DB_FILE if path is None else path
+    conn = sqlite3.connect(path, check_same_thread=check_same_thread)
+    # Only takes effect on a new, empty database, so it must precede the WAL
+    # switch; lets compact_tombstones() hand freed pages back incrementally.
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    apply_storage_profile(conn)
     cursor = conn.cursor()
 
     cursor.execute("""
@@ -96,30 +359,226 @@ def init_db():
         )
     """)
 
+    # Raw 32-byte trapdoors in a clustered (trapdoor, acc_no) key: a lookup
+    # is one covering B-tree range scan with no rowid indirection.
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS search_index (
-            trapdoor TEXT,
-            acc_no TEXT
+            trapdoor BLOB NOT NULL,
+            acc_no TEXT NOT NULL,
+            PRIMARY KEY (trapdoor, acc_no)
+        ) WITHOUT ROWID
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS posting_lists (
+            trapdoor BLOB NOT NULL,
+            first_acc TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            postings BLOB NOT NULL,
+            PRIMARY KEY (trapdoor, first_acc)
+        ) WITHOUT ROWID
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ngram_index (
+            trapdoor BLOB NOT NULL,
+            acc_no TEXT NOT NULL,
+            PRIMARY KEY (trapdoor, acc_no)
+        ) WITHOUT ROWID
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS range_index (
+            trapdoor BLOB NOT NULL,
+            acc_no TEXT NOT NULL,
+            PRIMARY KEY (trapdoor, acc_no)
+        ) WITHOUT ROWID
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS index_log (
+            seq INTEGER PRIMARY KEY,
+            trapdoor BLOB NOT NULL,
+            acc_no TEXT NOT NULL,
+            op INTEGER NOT NULL DEFAULT 1
         )
     """)
+    if "op" not in {row[1] for row in cursor.execute("PRAGMA table_info(index_log)")}:
+        cursor.execute("ALTER TABLE index_log ADD COLUMN op INTEGER NOT NULL DEFAULT 1")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS vault_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        ) WITHOUT ROWID
+    """)
 
     cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_trapdoor
-        ON search_index(trapdoor)
+        CREATE TABLE IF NOT EXISTS tombstones (
+            acc_no TEXT PRIMARY KEY,
+            deleted_at REAL NOT NULL
+        ) WITHOUT ROWID
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS key_rotation (
+            target_version INTEGER PRIMARY KEY,
+            last_acc_no TEXT,
+            rotated INTEGER NOT NULL DEFAULT 0
+        )
     """)
 
     conn.commit()
+    migrate_search_index(conn)
+    start_checkpoint_scheduler(path)
     return conn
 
+def migrate_search_index(conn):
+    # Converts the original hex-TEXT rowid layout (with idx_trapdoor) in place.
+    cursor = conn.cursor()
+    columns = {row[1]: row[2] for row in cursor.execute("PRAGMA table_info(search_index)")}
+    if columns.get("trapdoor", "").upper() != "TEXT":
+        if cursor.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        return
+
+    logging.info("Migrating search_index to binary trapdoor format")
+    conn.create_function("sv_unhex", 1, bytes.fromhex, deterministic=True)
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("""
+            CREATE TABLE search_index_v1 (
+                trapdoor BLOB NOT NULL,
+                acc_no TEXT NOT NULL,
+                PRIMARY KEY (trapdoor, acc_no)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            INSERT OR IGNORE INTO search_index_v1 (trapdoor, acc_no)
+            SELECT sv_unhex(trapdoor), acc_no FROM search_index
+            WHERE trapdoor IS NOT NULL AND acc_no IS NOT NULL
+        """)
+        cursor.execute("DROP TABLE search_index")
+        cursor.execute("ALTER TABLE search_index_v1 RENAME TO search_index")
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    # Hand the freed pages of the old table and index back to the filesystem.
+    cursor.execute("VACUUM")
+    logging.info("search_index migration complete")
+
+# =====================================================
+# DECRYPTED RECORD CACHE
+# =====================================================
+
+CACHE_MAX_ENTRIES = 10_000
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+CACHE_TTL_SECONDS = 300
+
+def database_id(conn) -> str:
+    # Path of the connection's main database file. Process-wide state that
+    # describes one vault (the record cache, the memory index) is keyed by it,
+    # so a process can have several vaults open at once.
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    return path or f":memory:{id(conn)}"
+
+class RecordCache:
+    # LRU + TTL cache of decrypted records keyed by (database, acc_no). Size
+    # is accounted by ciphertext length, which tracks the decoded record
+    # closely enough to cap memory without re-serializing on every put.
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES,
+                 ttl=CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, db: str, acc_no):
+        key = (db, acc_no)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            record, size, expires = entry
+            if expires < time.monotonic():
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(record)
+
+    def put(self, db: str, acc_no, record: dict, size: int):
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        key = (db, acc_no)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (dict(record), size, time.monotonic() + self.ttl)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, db: str, acc_no):
+        key = (db, acc_no)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+record_cache = RecordCache()
+
 # =====================================================
 # SERVICE LAYER
 # =====================================================
 
-def encrypt_payload(record: dict) -> bytes:
-    return cipher.encrypt(json.dumps(record).encode())
+def encrypt_payload(record: dict, version: int = None) -> bytes:
+    version = active_key_version() if version is None else version
+    token = get_cipher(version).encrypt(json.dumps(record).encode())
+    return bytes((version,)) + token
+
+def decrypt_token(blob: bytes) -> bytes:
+    return get_cipher(blob[0]).decrypt(blob[1:])
+
+def decode_record(data: bytes) -> dict:
+    return json.loads(data)
 
 def decrypt_payload(blob: bytes) -> dict:
-    return json.loads(cipher.decrypt(blob).decode())
+    # Split in two so instrumentation can tell Fernet time from JSON time.
+    return decode_record(decrypt_token(blob))
+
+def index_terms(record: dict) -> set:
+    return set(record["name"].split() + [record["acc_no"]])
 
 def insert_record(conn, record: dict):
     cursor = conn.cursor()
@@ -133,75 +592,2146 @@ def insert_record(conn, record: dict):
             (acc_no, encrypted_blob)
         )
     except sqlite3.IntegrityError:
-        logging.warning("Duplicate account insertion attempt")
-        raise
+        if not _purge_tombstoned(cursor, [acc_no]):
+            # Release the write lock the failed INSERT's transaction still holds.
+            conn.rollback()
+            logging.warning("Duplicate account insertion attempt")
+            raise
+        cursor.execute(
+            "INSERT INTO data_store (acc_no, payload) VALUES (?, ?)",
+            (acc_no, encrypted_blob)
+        )
+
+    # Read under the write lock the INSERT took, so it cannot change before
+    # this record's postings commit.
+    entries = index_entries(record, ngram_index_enabled(conn))
+    for table, trapdoors in entries.items():
+        cursor.executemany(
+            f"INSERT INTO {table} (trapdoor, acc_no) VALUES (?, ?)",
+            [(trapdoor, acc_no) for trapdoor in trapdoors]
+        )
+    _log_postings(cursor, entries["search_index"], acc_no, 1)
+
+    commit_insert(conn)
+    _index_changed(conn)
+    record_cache.invalidate(database_id(conn), acc_no)
+    logging.info("Inserted record securely")
+
+def commit_insert(conn):
+    # Its own function so enable_metrics() can time the commit.
+    conn.commit()
+
+def query_trapdoors(query: str) -> list:
+    # Tokenized exactly like index_terms(); duplicates collapse after
+    # normalization so "John john" is a single-term query.
+    return list(dict.fromkeys(generate_trapdoors(query.split())))
+
+def _required_terms(trapdoors: list, match: str) -> int:
+    if match not in ("all", "any"):
+        raise ValueError(f"Unknown match mode: {match}")
+    return len(trapdoors) if match == "all" else 1
+
+def _descending(order: str) -> bool:
+    if order not in ("asc", "desc"):
+        raise ValueError(f"Unknown order: {order}")
+    return order == "desc"
+
+def match_rows(conn, trapdoors: list, required: int, after: str = None,
+               limit: int = None, order: str = None) -> list:
+    # Returns (acc_no, payload) rows for accounts matching at least `required`
+    # of the trapdoors. With `order` ("asc"/"desc" by acc_no) or a keyset
+    # page (`after`/`limit`) the rows come back sorted; `after` is exclusive
+    # in the direction of the order.
+    descending = order is not None and _descending(order)
+    index = memory_index_for(conn)
+    if index is not None:
+        acc_nos = index.iter_matches(conn, trapdoors, required, after, descending)
+        return _fetch_page(conn, acc_nos, limit, descending)
+
+    if has_packed_postings(conn, trapdoors):
+        streams = [iter_packed_postings(conn, trapdoor, after, descending)
+                   for trapdoor in trapdoors]
+        return _fetch_page(conn, merge_matches(streams, required, descending),
+                           limit, descending)
+
+    # Every posting set is resolved in one round trip; the AND/OR is done by
+    # SQLite via HAVING so only surviving payloads are fetched and decrypted.
+    # Tombstones are dropped before the LIMIT so a page is never cut short.
+    placeholders = ",".join("?" * len(trapdoors))
+    params = list(trapdoors)
+    keyset = ""
+    if after is not None:
+        keyset = f"AND acc_no {'<' if descending else '>'} ?"
+        params.append(after)
+    params.append(required)
+    direction = ""
+    if order is not None or after is not None or limit is not None:
+        direction = "DESC" if descending else "ASC"
+    page = f"ORDER BY acc_no {direction}" if direction else ""
+    if limit is not None:
+        page += " LIMIT ?"
+        params.append(limit)
+
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT ds.acc_no, ds.payload
+        FROM data_store ds
+        JOIN (
+            SELECT acc_no
+            FROM search_index
+            WHERE trapdoor IN ({placeholders}) {keyset}
+              AND acc_no NOT IN (SELECT acc_no FROM tombstones)
+            GROUP BY acc_no
+            HAVING COUNT(DISTINCT trapdoor) >= ?
+            {page}
+        ) hits ON ds.acc_no = hits.acc_no
+        {f"ORDER BY ds.acc_no {direction}" if direction else ""}
+    """, params)
+    return cursor.fetchall()
+
+def _fetch_page(conn, acc_nos, limit: int, descending: bool = False) -> list:
+    # acc_nos is an iterable already in page order and past the cursor. It is
+    # consumed only as far as needed: tombstoned accounts are dropped by
+    # fetch_payloads(), so fetching continues until the page is full.
+    if limit is None:
+        return sorted(fetch_payloads(conn, list(acc_nos)), reverse=descending)
+
+    acc_nos = iter(acc_nos)
+    rows = []
+    while len(rows) < limit:
+        chunk = list(islice(acc_nos, limit - len(rows)))
+        if not chunk:
+            break
+        rows.extend(fetch_payloads(conn, chunk))
+    return sorted(rows, reverse=descending)
+
+def load_record(db: str, acc_no: str, blob: bytes) -> dict:
+    # db is the database_id() the row was read from.
+    record = record_cache.get(db, acc_no)
+    if record is None:
+        record = decrypt_payload(blob)
+        record_cache.put(db, acc_no, record, len(blob))
+    return record
+
+# Result sets smaller than this stay serial even when workers > 1 is asked
+# for: below it the hand-off to the pool costs more than the decryption it
+# spreads. Callers that have measured their own host pass `threshold`
+# instead; `python -m benchmarks.run` reports the crossover per executor
+# under "decrypt".
+PARALLEL_DECRYPT_THRESHOLD = 2000
+PARALLEL_DECRYPT_CHUNK = 1000
+
+def _load_chunk(db: str, rows: list) -> list:
+    return [load_record(db, acc_no, blob) for acc_no, blob in rows]
 
-    terms = record["name"].split() + [acc_no]
+def check_cancel(cancel):
+    # `cancel` is a threading.Event set by a caller that gave up on the read
+    # (AsyncVault on timeout). Raised as SQLite's own interrupt error, since
+    # conn.interrupt() reports the SQL phase of the same read that way.
+    if cancel is not None and cancel.is_set():
+        raise sqlite3.OperationalError("interrupted")
 
-    for term in set(terms):
-        trapdoor = generate_trapdoor(term)
+def _decrypt_chunk(blobs: list) -> list:
+    # Runs in the pool, so it only decrypts; the cache stays in the caller.
+    return [decrypt_payload(blob) for blob in blobs]
+
+@lru_cache(maxsize=None)
+def decrypt_pool(workers: int, executor: str = "thread"):
+    # One long-lived pool per (workers, executor): process start-up alone
+    # would otherwise eat the gain on every query. Threads only overlap where
+    # cryptography releases the GIL; processes scale with cores.
+    return ingest_pool(workers, executor)
+
+def load_records(db: str, rows: list, workers: int = 1,
+                 threshold: int = PARALLEL_DECRYPT_THRESHOLD,
+                 executor: str = "thread", cancel=None) -> list:
+    # `cancel` is checked before decryption starts and between chunks, so an
+    # abandoned read stops within one chunk instead of decrypting it all.
+    if workers <= 1 or len(rows) < threshold:
+        records = []
+        for i in range(0, len(rows), PARALLEL_DECRYPT_CHUNK):
+            check_cancel(cancel)
+            records.extend(_load_chunk(db, rows[i:i + PARALLEL_DECRYPT_CHUNK]))
+        return records
+
+    # Cache hits are served here; only the misses travel to the pool.
+    records = [record_cache.get(db, acc_no) for acc_no, _ in rows]
+    missing = [i for i, record in enumerate(records) if record is None]
+    chunks = [missing[i:i + PARALLEL_DECRYPT_CHUNK]
+              for i in range(0, len(missing), PARALLEL_DECRYPT_CHUNK)]
+    check_cancel(cancel)
+    pool = decrypt_pool(workers, executor)
+    # map() yields in submission order, so each chunk lines up with its rows.
+    decrypted = pool.map(_decrypt_chunk, [[rows[i][1] for i in chunk] for chunk in chunks])
+    try:
+        for chunk, loaded in zip(chunks, decrypted):
+            check_cancel(cancel)
+            for i, record in zip(chunk, loaded):
+                acc_no, blob = rows[i]
+                records[i] = record
+                record_cache.put(db, acc_no, record, len(blob))
+    finally:
+        # Cancels the chunks not yet started if the read was abandoned.
+        decrypted.close()
+    return records
+
+def search_records(conn, query: str, match: str = "all", workers: int = 1,
+                   limit: int = None, order: str = "asc", executor: str = "thread",
+                   cancel=None):
+    # Results are ordered by account number; with `limit` only the first k
+    # payloads in that order are fetched and decrypted.
+    trapdoors = query_trapdoors(query)
+    required = _required_terms(trapdoors, match)
+    _descending(order)
+    if not trapdoors or limit == 0:
+        return []
+
+    rows = match_rows(conn, trapdoors, required, limit=limit, order=order)
+    results = load_records(database_id(conn), rows, workers, executor=executor,
+                           cancel=cancel)
+
+    logging.info("Search performed securely")
+    return results
+
+COUNT_TOMBSTONE_PROBES = 1000
+
+def _count_live(conn, acc_nos) -> int:
+    # acc_nos may be any iterable; it is consumed a chunk at a time.
+    cursor = conn.cursor()
+    tombstoned = cursor.execute("SELECT 1 FROM tombstones LIMIT 1").fetchone() is not None
+    live = 0
+    acc_nos = iter(acc_nos)
+    while chunk := list(islice(acc_nos, SQLITE_MAX_VARS)):
+        live += len(chunk)
+        if tombstoned:
+            placeholders = ",".join("?" * len(chunk))
+            cursor.execute(
+                f"SELECT COUNT(*) FROM tombstones WHERE acc_no IN ({placeholders})",
+                chunk
+            )
+            live -= cursor.fetchone()[0]
+    return live
+
+def _tombstoned_postings(conn, contains):
+    # How many tombstoned accounts `contains` reports as postings, or None
+    # when there are too many tombstones to probe one at a time.
+    cursor = conn.cursor()
+    cursor.execute("SELECT acc_no FROM tombstones LIMIT ?", (COUNT_TOMBSTONE_PROBES + 1,))
+    dead = [row[0] for row in cursor.fetchall()]
+    if len(dead) > COUNT_TOMBSTONE_PROBES:
+        return None
+    return sum(1 for acc_no in dead if contains(acc_no))
+
+def count_matches(conn, query: str, match: str = "all") -> int:
+    # Answered from the indexes alone: no payload is read or decrypted.
+    trapdoors = query_trapdoors(query)
+    required = _required_terms(trapdoors, match)
+    if not trapdoors:
+        return 0
+
+    index = memory_index_for(conn)
+    if len(trapdoors) == 1 and (index is not None or has_packed_postings(conn, trapdoors)):
+        # A single term's size is stored with it (the snapshot run, the
+        # packed chunk counts), so only its tombstoned accounts are probed.
+        trapdoor = trapdoors[0]
+        if index is not None:
+            total = index.count(conn, trapdoor)
+            dead = _tombstoned_postings(conn, lambda acc_no: index.contains(trapdoor, acc_no))
+        else:
+            total = packed_posting_count(conn, trapdoor)
+            dead = _tombstoned_postings(conn, lambda acc_no: packed_contains(conn, trapdoor, acc_no))
+        if dead is not None:
+            return total - dead
+
+    if index is not None:
+        return _count_live(conn, index.iter_matches(conn, trapdoors, required))
+
+    if has_packed_postings(conn, trapdoors):
+        streams = [iter_packed_postings(conn, trapdoor) for trapdoor in trapdoors]
+        return _count_live(conn, merge_matches(streams, required))
+
+    placeholders = ",".join("?" * len(trapdoors))
+    cursor = conn.cursor()
+    if required == 1:
+        cursor.execute(f"""
+            SELECT COUNT(DISTINCT acc_no) FROM search_index
+            WHERE trapdoor IN ({placeholders})
+              AND acc_no NOT IN (SELECT acc_no FROM tombstones)
+        """, trapdoors)
+    else:
+        cursor.execute(f"""
+            SELECT COUNT(*) FROM (
+                SELECT acc_no FROM search_index
+                WHERE trapdoor IN ({placeholders})
+                  AND acc_no NOT IN (SELECT acc_no FROM tombstones)
+                GROUP BY acc_no
+                HAVING COUNT(DISTINCT trapdoor) >= ?
+            )
+        """, trapdoors + [required])
+    return cursor.fetchone()[0]
+
+# =====================================================
+# PAGINATED SEARCH
+# =====================================================
+
+SEARCH_PAGE_SIZE = 25
+INDEX_BACKFILL_BATCH_SIZE = 500
+
+def encode_cursor(acc_no: str) -> str:
+    return base64.urlsafe_b64encode(acc_no.encode()).decode()
+
+def decode_cursor(token: str) -> str:
+    return base64.urlsafe_b64decode(token.encode()).decode()
+
+def search_page(conn, query: str, page_size: int = SEARCH_PAGE_SIZE,
+                cursor_token: str = None, match: str = "all", cancel=None) -> tuple:
+    # Returns (records, next_cursor_token); the token is None on the last page.
+    trapdoors = query_trapdoors(query)
+    required = _required_terms(trapdoors, match)
+    if not trapdoors:
+        return [], None
+
+    after = decode_cursor(cursor_token) if cursor_token else None
+    # One extra row tells us whether another page exists without a COUNT.
+    rows = match_rows(conn, trapdoors, required, after, page_size + 1)
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    db = database_id(conn)
+    records = load_records(db, rows, cancel=cancel)
+    next_token = encode_cursor(rows[-1][0]) if has_more else None
+    return records, next_token
+
+def iter_search(conn, query: str, page_size: int = SEARCH_PAGE_SIZE,
+                cursor_token: str = None, match: str = "all"):
+    # Yields records one at a time, fetching page_size rows per query and
+    # decrypting each payload only when the caller advances to it.
+    trapdoors = query_trapdoors(query)
+    required = _required_terms(trapdoors, match)
+    if not trapdoors:
+        return
+
+    after = decode_cursor(cursor_token) if cursor_token else None
+    db = database_id(conn)
+    while True:
+        rows = match_rows(conn, trapdoors, required, after, page_size)
+        for acc_no, blob in rows:
+            yield load_record(db, acc_no, blob)
+        if len(rows) < page_size:
+            return
+        after = rows[-1][0]
+
+def fetch_payloads(conn, acc_nos: list) -> list:
+    cursor = conn.cursor()
+    rows = []
+    for i in range(0, len(acc_nos), SQLITE_MAX_VARS):
+        chunk = acc_nos[i:i + SQLITE_MAX_VARS]
+        placeholders = ",".join("?" * len(chunk))
         cursor.execute(
-            "INSERT INTO search_index (trapdoor, acc_no) VALUES (?, ?)",
-            (trapdoor, acc_no)
+            f"""
+            SELECT acc_no, payload FROM data_store
+            WHERE acc_no IN ({placeholders})
+              AND acc_no NOT IN (SELECT acc_no FROM tombstones)
+            """,
+            chunk
         )
+        rows.extend(cursor.fetchall())
+    return rows
 
+# =====================================================
+# PREFIX SEARCH
+# =====================================================
+
+def search_prefix(conn, query: str, limit: int = SEARCH_PAGE_SIZE) -> list:
+    # Type-ahead lookup: every query token must be a prefix of some name
+    # token. Tokens shorter than PREFIX_MIN_LENGTH are not indexed.
+    tokens = [token.lower() for token in query.split()]
+    if not tokens or any(len(token) < PREFIX_MIN_LENGTH for token in tokens):
+        return []
+
+    grams = set()
+    verify = False
+    for token in tokens:
+        grams.add(("p", token[:PREFIX_MAX_LENGTH]))
+        if len(token) > PREFIX_MAX_LENGTH:
+            verify = True
+            grams.update(("t", gram) for gram in tail_trigrams(token))
+    trapdoors = [generate_ngram_trapdoor(kind, gram) for kind, gram in grams]
+
+    # Edge-prefix postings are exact, so LIMIT can be pushed into SQL unless
+    # trigram candidates still need checking against the decrypted name.
+    # Tombstones are dropped before the LIMIT so they cannot use up the page.
+    placeholders = ",".join("?" * len(trapdoors))
+    params = [*trapdoors, len(trapdoors)]
+    page = ""
+    if not verify:
+        page = "LIMIT ?"
+        params.append(limit)
+
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT acc_no FROM ngram_index
+        WHERE trapdoor IN ({placeholders})
+          AND acc_no NOT IN (SELECT acc_no FROM tombstones)
+        GROUP BY acc_no
+        HAVING COUNT(*) >= ?
+        ORDER BY acc_no
+        {page}
+    """, params)
+    acc_nos = [row[0] for row in cursor.fetchall()]
+
+    results = []
+    db = database_id(conn)
+    for acc_no, blob in sorted(fetch_payloads(conn, acc_nos)):
+        record = load_record(db, acc_no, blob)
+        if verify:
+            names = [term.lower() for term in record["name"].split()]
+            if not all(any(name.startswith(token) for name in names) for token in tokens):
+                continue
+        results.append(record)
+        if len(results) >= limit:
+            break
+
+    logging.info("Prefix search performed securely")
+    return results
+
+def backfill_index(conn, table: str, entries, batch_size: int = INDEX_BACKFILL_BATCH_SIZE) -> int:
+    # Rebuilds one index table from data_store for records stored before the
+    # index existed. `entries` maps a decrypted record to its trapdoors.
+    cursor = conn.cursor()
+    last_acc_no = None
+    indexed = 0
+    while True:
+        if last_acc_no is None:
+            cursor.execute(
+                "SELECT acc_no, payload FROM data_store ORDER BY acc_no LIMIT ?",
+                (batch_size,)
+            )
+        else:
+            cursor.execute(
+                "SELECT acc_no, payload FROM data_store WHERE acc_no > ? ORDER BY acc_no LIMIT ?",
+                (last_acc_no, batch_size)
+            )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+
+        index_rows = []
+        for acc_no, blob in rows:
+            record = decrypt_payload(blob)
+            index_rows.extend((trapdoor, acc_no) for trapdoor in entries(record))
+        cursor.executemany(
+            f"INSERT OR IGNORE INTO {table} (trapdoor, acc_no) VALUES (?, ?)",
+            index_rows
+        )
+        conn.commit()
+        indexed += len(rows)
+        last_acc_no = rows[-1][0]
+
+    logging.info(f"Backfilled {table} for {indexed} records")
+    return indexed
+
+def ngram_index_enabled(conn) -> bool:
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM vault_meta WHERE key = 'ngram_index'")
+    return cursor.fetchone() is not None
+
+def build_ngram_index(conn) -> int:
+    # Switches the n-gram index on for the vault, then backfills it. The
+    # switch commits first: writes committed before it are covered by the
+    # backfill, and later ones index their own n-grams.
+    cursor = conn.cursor()
+    if conn.in_transaction:
+        conn.commit()
+    cursor.execute("INSERT OR IGNORE INTO vault_meta (key, value) VALUES ('ngram_index', '1')")
     conn.commit()
-    logging.info("Inserted record securely")
+    return backfill_index(conn, "ngram_index", index_ngrams)
 
-def search_records(conn, query: str):
+def drop_ngram_index(conn):
+    # Switches the n-gram index off for the vault and frees its postings.
     cursor = conn.cursor()
-    trapdoor = generate_trapdoor(query)
+    if not conn.in_transaction:
+        cursor.execute("BEGIN IMMEDIATE")
+    try:
+        cursor.execute("DELETE FROM vault_meta WHERE key = 'ngram_index'")
+        cursor.execute("DELETE FROM ngram_index")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
 
-    cursor.execute("""
-        SELECT ds.payload
-        FROM data_store ds
-        JOIN search_index si ON ds.acc_no = si.acc_no
-        WHERE si.trapdoor = ?
-    """, (trapdoor,))
+# =====================================================
+# RANGE SEARCH
+# =====================================================
 
-    rows = cursor.fetchall()
+def search_range(conn, field: str, lo: float = None, hi: float = None) -> list:
+    # lo/hi are inclusive; None (or an infinity) leaves that end open.
+    if field not in RANGE_FIELDS:
+        raise ValueError(f"No range index for field: {field}")
+    lo = -math.inf if lo is None else lo
+    hi = math.inf if hi is None else hi
+    if math.isnan(lo) or math.isnan(hi):
+        raise ValueError("Range bounds must not be NaN")
+    if lo > hi:
+        return []
 
+    trapdoors = range_cover(field, lo, hi)
+    cursor = conn.cursor()
+    acc_nos = set()
+    for i in range(0, len(trapdoors), SQLITE_MAX_VARS):
+        chunk = trapdoors[i:i + SQLITE_MAX_VARS]
+        placeholders = ",".join("?" * len(chunk))
+        cursor.execute(
+            f"SELECT acc_no FROM range_index WHERE trapdoor IN ({placeholders})",
+            chunk
+        )
+        acc_nos.update(row[0] for row in cursor.fetchall())
+
+    # Edge buckets overshoot the range, so candidates are filtered exactly.
     results = []
-    for row in rows:
-        results.append(decrypt_payload(row[0]))
+    db = database_id(conn)
+    for acc_no, blob in sorted(fetch_payloads(conn, sorted(acc_nos))):
+        record = load_record(db, acc_no, blob)
+        value = numeric_value(record, field)
+        if value is not None and lo <= value <= hi:
+            results.append(record)
 
-    logging.info("Search performed securely")
+    logging.info("Range search performed securely")
     return results
 
+def build_range_index(conn) -> int:
+    return backfill_index(conn, "range_index", index_ranges)
+
+# =====================================================
+# PACKED POSTING LISTS (High-Frequency Terms)
+# =====================================================
+#
+# Hot trapdoors can be moved out of search_index into posting_lists, where
+# each row holds up to POSTING_CHUNK_SIZE sorted account numbers, front-coded
+# against their predecessor and zlib-compressed. New inserts keep appending
+# plain rows to search_index, which acts as the unmerged tail of a packed
+# term; compact_postings() folds that tail back into the chunks.
+
+PACK_MIN_POSTINGS = 1024
+POSTING_CHUNK_SIZE = 4096
+DECODED_CHUNK_CACHE_SIZE = 32
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _read_varint(data: bytes, pos: int) -> tuple:
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+def encode_postings(acc_nos: list) -> bytes:
+    out = bytearray()
+    prev = b""
+    for acc_no in acc_nos:
+        cur = acc_no.encode()
+        shared = len(os.path.commonprefix((prev, cur)))
+        _write_varint(out, shared)
+        _write_varint(out, len(cur) - shared)
+        out += cur[shared:]
+        prev = cur
+    return zlib.compress(bytes(out))
+
+def decode_postings(blob: bytes) -> list:
+    data = zlib.decompress(blob)
+    acc_nos = []
+    prev = b""
+    pos = 0
+    while pos < len(data):
+        shared, pos = _read_varint(data, pos)
+        length, pos = _read_varint(data, pos)
+        cur = prev[:shared] + data[pos:pos + length]
+        pos += length
+        acc_nos.append(cur.decode())
+        prev = cur
+    return acc_nos
+
+def has_packed_postings(conn, trapdoors: list) -> bool:
+    placeholders = ",".join("?" * len(trapdoors))
+    cursor = conn.cursor()
+    cursor.execute(
+        f"SELECT 1 FROM posting_lists WHERE trapdoor IN ({placeholders}) LIMIT 1",
+        trapdoors
+    )
+    return cursor.fetchone() is not None
+
+@lru_cache(maxsize=DECODED_CHUNK_CACHE_SIZE)
+def _decoded_chunk(blob: bytes) -> tuple:
+    # Keyed on the blob itself, so a rewritten chunk is never served stale.
+    # Consecutive keyset pages mostly land in the same chunk.
+    return tuple(decode_postings(blob))
+
+def _iter_chunks(conn, trapdoor: bytes, after: str, descending: bool):
+    cursor = conn.cursor()
+    if descending:
+        # Every entry of a chunk starting at or past `after` is too large.
+        bound = "" if after is None else "AND first_acc < ?"
+        cursor.execute(f"""
+            SELECT postings FROM posting_lists
+            WHERE trapdoor = ? {bound}
+            ORDER BY first_acc DESC
+        """, (trapdoor,) if after is None else (trapdoor, after))
+    else:
+        # Start at the chunk whose range covers `after`.
+        cursor.execute("""
+            SELECT postings FROM posting_lists
+            WHERE trapdoor = ? AND first_acc >= COALESCE((
+                SELECT MAX(first_acc) FROM posting_lists
+                WHERE trapdoor = ? AND first_acc <= ?
+            ), '')
+            ORDER BY first_acc
+        """, (trapdoor, trapdoor, "" if after is None else after))
+    for (blob,) in cursor:
+        acc_nos = _decoded_chunk(blob)
+        if descending:
+            if after is not None:
+                acc_nos = acc_nos[:bisect_left(acc_nos, after)]
+            yield from reversed(acc_nos)
+        else:
+            if after is not None:
+                acc_nos = acc_nos[bisect_right(acc_nos, after):]
+            yield from acc_nos
+
+def _iter_tail(conn, trapdoor: bytes, after: str, descending: bool):
+    params = [trapdoor]
+    bound = ""
+    if after is not None:
+        bound = f"AND acc_no {'<' if descending else '>'} ?"
+        params.append(after)
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT acc_no FROM search_index
+        WHERE trapdoor = ? {bound}
+        ORDER BY acc_no {'DESC' if descending else 'ASC'}
+    """, params)
+    for (acc_no,) in cursor:
+        yield acc_no
+
+def _dedupe(acc_nos):
+    previous = None
+    for acc_no in acc_nos:
+        if acc_no != previous:
+            yield acc_no
+            previous = acc_no
+
+def iter_packed_postings(conn, trapdoor: bytes, after: str = None,
+                         descending: bool = False):
+    # One term's accounts in acc_no order past `after`, reading a chunk only
+    # when the walk reaches it, merged with the plain search_index tail.
+    return _dedupe(heapq.merge(_iter_chunks(conn, trapdoor, after, descending),
+                               _iter_tail(conn, trapdoor, after, descending),
+                               reverse=descending))
+
+def packed_posting_count(conn, trapdoor: bytes) -> int:
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT COALESCE(SUM(count), 0) FROM posting_lists WHERE trapdoor = ?",
+        (trapdoor,)
+    )
+    packed = cursor.fetchone()[0]
+    cursor.execute("SELECT COUNT(*) FROM search_index WHERE trapdoor = ?", (trapdoor,))
+    return packed + cursor.fetchone()[0]
+
+def packed_contains(conn, trapdoor: bytes, acc_no: str) -> bool:
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT 1 FROM search_index WHERE trapdoor = ? AND acc_no = ?",
+        (trapdoor, acc_no)
+    )
+    if cursor.fetchone() is not None:
+        return True
+    cursor.execute("""
+        SELECT postings FROM posting_lists
+        WHERE trapdoor = ? AND first_acc <= ?
+        ORDER BY first_acc DESC LIMIT 1
+    """, (trapdoor, acc_no))
+    row = cursor.fetchone()
+    if row is None:
+        return False
+    acc_nos = _decoded_chunk(row[0])
+    i = bisect_left(acc_nos, acc_no)
+    return i < len(acc_nos) and acc_nos[i] == acc_no
+
+def merge_matches(streams: list, required: int, descending: bool = False):
+    # streams holds one ordered, duplicate-free iterator per term; yields
+    # every account found in at least `required` of them, lazily and in order.
+    current, seen = None, 0
+    for acc_no in heapq.merge(*streams, reverse=descending):
+        if acc_no != current:
+            current, seen = acc_no, 0
+        seen += 1
+        if seen == required:
+            yield acc_no
+
+def _merge_tail(cursor, trapdoor: bytes, tail: list):
+    firsts = [row[0] for row in cursor.execute(
+        "SELECT first_acc FROM posting_lists WHERE trapdoor = ? ORDER BY first_acc",
+        (trapdoor,)
+    )]
+
+    # Only chunks at or after the one the smallest new entry falls into are
+    # rewritten, so ever-increasing account numbers touch just the last chunk.
+    start = firsts[0] if firsts else ""
+    for first in firsts:
+        if first <= tail[0]:
+            start = first
+
+    cursor.execute("""
+        SELECT postings FROM posting_lists
+        WHERE trapdoor = ? AND first_acc >= ?
+        ORDER BY first_acc
+    """, (trapdoor, start))
+    existing = [acc for (blob,) in cursor.fetchall() for acc in decode_postings(blob)]
+    cursor.execute(
+        "DELETE FROM posting_lists WHERE trapdoor = ? AND first_acc >= ?",
+        (trapdoor, start)
+    )
+
+    merged = sorted(set(existing).union(tail))
+    cursor.executemany(
+        "INSERT INTO posting_lists (trapdoor, first_acc, count, postings) VALUES (?, ?, ?, ?)",
+        [
+            (trapdoor, chunk[0], len(chunk), encode_postings(chunk))
+            for chunk in (
+                merged[i:i + POSTING_CHUNK_SIZE]
+                for i in range(0, len(merged), POSTING_CHUNK_SIZE)
+            )
+        ]
+    )
+
+def compact_postings(conn, min_postings: int = PACK_MIN_POSTINGS) -> dict:
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT trapdoor FROM search_index
+        GROUP BY trapdoor
+        HAVING COUNT(*) >= ?
+        UNION
+        SELECT trapdoor FROM posting_lists pl
+        WHERE EXISTS (SELECT 1 FROM search_index si WHERE si.trapdoor = pl.trapdoor)
+    """, (min_postings,))
+    trapdoors = [row[0] for row in cursor.fetchall()]
+
+    stats = {"terms": 0, "postings": 0}
+    # One short transaction per term keeps the write lock hold time bounded.
+    for trapdoor in trapdoors:
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.execute(
+                "SELECT acc_no FROM search_index WHERE trapdoor = ? ORDER BY acc_no",
+                (trapdoor,)
+            )
+            tail = [row[0] for row in cursor.fetchall()]
+            if tail:
+                _merge_tail(cursor, trapdoor, tail)
+                cursor.execute("DELETE FROM search_index WHERE trapdoor = ?", (trapdoor,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        stats["terms"] += 1
+        stats["postings"] += len(tail)
+
+    logging.info(f"Compacted {stats['postings']} postings across {stats['terms']} terms")
+    return stats
+
+# =====================================================
+# IN-MEMORY TRAPDOOR INDEX (mmap Snapshot + Delta Log)
+# =====================================================
+#
+# build_index_snapshot() writes the complete trapdoor -> acc_no mapping to a
+# single file:
+#
+#   header | hash slots | postings (uint32 account ids) | account offsets | account bytes
+#
+# Slots use open addressing keyed on the first 8 bytes of the trapdoor,
+# which is uniformly distributed because it is an HMAC. Account ids follow
+# acc_no sort order, so every posting run is already sorted. Readers mmap the
+# file read-only and probe it in place, so every process shares the same page
+# cache pages. Postings added or removed after the snapshot are logged to
+# index_log and replayed into a small per-process delta. Logging is switched
+# on for the database (a vault_meta row) by the first snapshot build, so
+# every writer logs - the import CLI, AsyncVault, other workers - whether or
+# not it searches through the memory index itself.
+#
+# By default the snapshot sits next to the database as
+# <name>.search_index.snap. The first build records its path in vault_meta,
+# and every later build and reader uses that file: a rebuild trims index_log up to its
+# own snapshot, which any other snapshot of the vault would still need. A
+# lease row keeps two processes from rebuilding at once. Each process that
+# enables the index runs a background check that rebuilds the snapshot once
+# INDEX_LOG_REBUILD_ROWS postings have been logged since the last one, which
+# keeps both the log and every reader's delta small.
+#
+# Indexes are held per database (database_id), so connections to other
+# vaults in the same process keep using their SQL indexes.
+
+INDEX_SNAPSHOT_FILE = "search_index.snap"
+MEMORY_INDEX_REFRESH_INTERVAL = 1.0
+MEMORY_INDEX_BLOCK = 256
+INDEX_LOG_REBUILD_ROWS = 100_000
+INDEX_REBUILD_CHECK_INTERVAL = 60.0
+INDEX_REBUILD_LEASE = 3600.0
+
+_SNAPSHOT_MAGIC = b"SVIX"
+_SNAPSHOT_HEADER = struct.Struct("<4sHHQIII")
+_SNAPSHOT_SLOT = struct.Struct("<32sII")
+
+memory_indexes = {}  # database_id -> MemoryIndex
+_index_rebuilders = {}  # database_id -> (thread, stop_event)
+
+def memory_index_for(conn):
+    # Most processes never enable the index; they skip the PRAGMA entirely.
+    if not memory_indexes:
+        return None
+    return memory_indexes.get(database_id(conn))
+
+def _uint32_array(values) -> array:
+    arr = array("I", values)
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr
+
+def _index_log_enabled(cursor) -> bool:
+    cursor.execute("SELECT 1 FROM vault_meta WHERE key = 'index_log'")
+    return cursor.fetchone() is not None
+
+def _index_changed(conn):
+    # This process's own writes must show up in its very next search.
+    index = memory_index_for(conn)
+    if index is not None:
+        index.invalidate()
+
+def index_snapshot_path(conn, path: str = None) -> str:
+    # The path recorded by the vault's first snapshot build; before that,
+    # `path`, or <database name>.search_index.snap next to the database.
+    # Recorded relative to the database's directory, so a vault directory
+    # can be moved as a whole.
+    db = database_id(conn)
+    base = os.path.dirname(db) if os.path.isabs(db) else os.getcwd()
+    cursor = conn.cursor()
+    cursor.execute("SELECT value FROM vault_meta WHERE key = 'index_snapshot'")
+    row = cursor.fetchone()
+    if row is not None:
+        recorded = os.path.join(base, row[0])
+        if path is not None and os.path.abspath(path) != recorded:
+            raise ValueError(f"This vault's index snapshot is {recorded}")
+        return recorded
+    if path is None:
+        path = f"{os.path.splitext(db)[0]}.{INDEX_SNAPSHOT_FILE}" \
+            if os.path.isabs(db) else INDEX_SNAPSHOT_FILE
+    return os.path.abspath(path)
+
+def index_log_rows(conn) -> int:
+    # Postings logged since the last snapshot; the high-water row it keeps
+    # makes this a span of seq rather than a COUNT.
+    cursor = conn.cursor()
+    cursor.execute("SELECT COALESCE(MAX(seq) - MIN(seq), 0) FROM index_log")
+    return cursor.fetchone()[0]
+
+def build_index_snapshot(conn, path: str = None) -> dict:
+    # Returns None without building when another build holds the lease.
+    cursor = conn.cursor()
+    if conn.in_transaction:
+        conn.commit()
+    path = index_snapshot_path(conn, path)
+
+    # Committed before the scan starts: writes that finish earlier are in the
+    # scan, later ones see the flag and land in index_log.
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        cursor.execute("SELECT value FROM vault_meta WHERE key = 'index_rebuild'")
+        lease = cursor.fetchone()
+        if lease is not None and time.time() - float(lease[0]) < INDEX_REBUILD_LEASE:
+            conn.rollback()
+            logging.info("Index snapshot build skipped: another build is running")
+            return None
+        db = database_id(conn)
+        recorded = os.path.relpath(path, os.path.dirname(db)) if os.path.isabs(db) else path
+        cursor.executemany(
+            "INSERT OR REPLACE INTO vault_meta (key, value) VALUES (?, ?)",
+            [("index_log", "1"), ("index_snapshot", recorded), ("index_rebuild", str(time.time()))]
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    try:
+        return _write_index_snapshot(conn, path)
+    finally:
+        cursor.execute("DELETE FROM vault_meta WHERE key = 'index_rebuild'")
+        conn.commit()
+
+def _write_index_snapshot(conn, path: str) -> dict:
+    cursor = conn.cursor()
+
+    # A single read transaction makes the scan and the log high-water mark
+    # consistent with each other.
+    cursor.execute("BEGIN")
+    try:
+        cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM index_log")
+        seq = cursor.fetchone()[0]
+        postings = {}
+        cursor.execute("SELECT trapdoor, acc_no FROM search_index")
+        for trapdoor, acc_no in cursor:
+            postings.setdefault(trapdoor, []).append(acc_no)
+        cursor.execute("SELECT trapdoor, postings FROM posting_lists")
+        for trapdoor, blob in cursor:
+            postings.setdefault(trapdoor, []).extend(decode_postings(blob))
+    finally:
+        conn.commit()
+
+    accounts = sorted({acc_no for acc_nos in postings.values() for acc_no in acc_nos})
+    account_ids = {acc_no: i for i, acc_no in enumerate(accounts)}
+
+    n_slots = 1
+    while n_slots < 2 * len(postings):
+        n_slots *= 2
+    slots = bytearray(n_slots * _SNAPSHOT_SLOT.size)
+    posting_ids = array("I")
+    mask = n_slots - 1
+    for trapdoor, acc_nos in postings.items():
+        ids = sorted({account_ids[acc_no] for acc_no in acc_nos})
+        i = int.from_bytes(trapdoor[:8], "little") & mask
+        while slots[i * _SNAPSHOT_SLOT.size + 36:i * _SNAPSHOT_SLOT.size + 40] != bytes(4):
+            i = (i + 1) & mask
+        _SNAPSHOT_SLOT.pack_into(slots, i * _SNAPSHOT_SLOT.size,
+                                 trapdoor, len(posting_ids), len(ids))
+        posting_ids.extend(ids)
+
+    encoded = [acc_no.encode() for acc_no in accounts]
+    offsets = [0]
+    for raw in encoded:
+        offsets.append(offsets[-1] + len(raw))
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, 1, 0, seq, n_slots,
+                                      len(accounts), len(posting_ids)))
+        f.write(slots)
+        f.write(_uint32_array(posting_ids).tobytes())
+        f.write(_uint32_array(offsets).tobytes())
+        f.write(b"".join(encoded))
+    # Readers still mapping the old file keep their inode; they pick up the
+    # new one on their next refresh.
+    os.replace(tmp_path, path)
+
+    # The high-water row is kept: with an empty table SQLite would hand out
+    # seq 1 again, and readers only replay seq > their snapshot's.
+    cursor.execute("DELETE FROM index_log WHERE seq < ?", (seq,))
+    conn.commit()
+    _index_changed(conn)
+
+    stats = {"trapdoors": len(postings), "postings": len(posting_ids),
+             "accounts": len(accounts), "seq": seq}
+    logging.info(f"Wrote index snapshot with {stats['postings']} postings")
+    return stats
+
+class MemoryIndex:
+    # Read-only view over a snapshot file plus the postings logged since.
+
+    def __init__(self, path: str = INDEX_SNAPSHOT_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+        self._map = None
+        self._views = []
+        self._identity = None
+        self._checked = 0.0
+        self.seq = 0
+        self._delta = {}
+        self._removed = {}
+        self._stale = False
+        self._load()
+
+    def _load(self):
+        if sys.byteorder != "little":
+            raise RuntimeError("Index snapshots require a little-endian host")
+        self.close()
+        self._file = open(self.path, "rb")
+        stat = os.fstat(self._file.fileno())
+        self._identity = (stat.st_ino, stat.st_mtime_ns)
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, _, _, seq, n_slots, n_accounts, n_postings = \
+            _SNAPSHOT_HEADER.unpack_from(self._map, 0)
+        if magic != _SNAPSHOT_MAGIC:
+            raise ValueError(f"{self.path} is not an index snapshot")
+
+        self.seq = seq
+        self._delta = {}
+        self._removed = {}
+        self._n_slots = n_slots
+        self._slots_at = _SNAPSHOT_HEADER.size
+        postings_at = self._slots_at + n_slots * _SNAPSHOT_SLOT.size
+        offsets_at = postings_at + n_postings * 4
+        strings_at = offsets_at + (n_accounts + 1) * 4
+
+        view = memoryview(self._map)
+        self._postings = view[postings_at:offsets_at].cast("I")
+        self._offsets = view[offsets_at:strings_at].cast("I")
+        self._strings_at = strings_at
+        self._views = [view, self._postings, self._offsets]
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = None
+
+    def invalidate(self):
+        self._stale = True
+
+    def refresh(self, conn, force: bool = False):
+        now = time.monotonic()
+        if not (force or self._stale) and now - self._checked < MEMORY_INDEX_REFRESH_INTERVAL:
+            return
+        self._checked = now
+        self._stale = False
+
+        with self._lock:
+            stat = os.stat(self.path)
+            if (stat.st_ino, stat.st_mtime_ns) != self._identity:
+                self._load()
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT seq, trapdoor, acc_no, op FROM index_log WHERE seq > ? ORDER BY seq",
+                (self.seq,)
+            )
+            for seq, trapdoor, acc_no, op in cursor.fetchall():
+                added = self._delta.setdefault(trapdoor, set())
+                removed = self._removed.setdefault(trapdoor, set())
+                if op > 0:
+                    added.add(acc_no)
+                    removed.discard(acc_no)
+                else:
+                    removed.add(acc_no)
+                    added.discard(acc_no)
+                self.seq = seq
+
+    def _find_slot(self, trapdoor: bytes):
+        mask = self._n_slots - 1
+        i = int.from_bytes(trapdoor[:8], "little") & mask
+        while True:
+            key, start, count = _SNAPSHOT_SLOT.unpack_from(
+                self._map, self._slots_at + i * _SNAPSHOT_SLOT.size
+            )
+            if count == 0:
+                return None
+            if key == trapdoor:
+                return start, count
+            i = (i + 1) & mask
+
+    def _account(self, account_id: int) -> str:
+        offsets = self._offsets
+        base = self._strings_at
+        return self._map[base + offsets[account_id]:base + offsets[account_id + 1]].decode()
+
+    def _in_snapshot(self, slot, acc_no: str) -> bool:
+        if slot is None:
+            return False
+        start, count = slot
+        run = self._postings[start:start + count]
+        i = bisect_left(run, acc_no, key=self._account)
+        return i < count and self._account(run[i]) == acc_no
+
+    def count(self, conn, trapdoor: bytes) -> int:
+        # The snapshot run length, corrected by the delta; nothing is decoded
+        # beyond a bisect per delta entry.
+        self.refresh(conn)
+        with self._lock:
+            slot = self._find_slot(trapdoor)
+            total = slot[1] if slot else 0
+            total += sum(1 for acc_no in self._delta.get(trapdoor, ())
+                         if not self._in_snapshot(slot, acc_no))
+            total -= sum(1 for acc_no in self._removed.get(trapdoor, ())
+                         if self._in_snapshot(slot, acc_no))
+        return total
+
+    def contains(self, trapdoor: bytes, acc_no: str) -> bool:
+        with self._lock:
+            if acc_no in self._delta.get(trapdoor, ()):
+                return True
+            if acc_no in self._removed.get(trapdoor, ()):
+                return False
+            return self._in_snapshot(self._find_slot(trapdoor), acc_no)
+
+    def _snapshot_block(self, trapdoor: bytes, after: str, descending: bool) -> list:
+        # Account ids follow acc_no order, so `after` is found by bisecting
+        # the posting run itself.
+        slot = self._find_slot(trapdoor)
+        if slot is None:
+            return []
+        start, count = slot
+        run = self._postings[start:start + count]
+        if descending:
+            end = count if after is None else bisect_left(run, after, key=self._account)
+            ids = reversed(run[max(0, end - MEMORY_INDEX_BLOCK):end].tolist())
+        else:
+            begin = 0 if after is None else bisect_right(run, after, key=self._account)
+            ids = run[begin:begin + MEMORY_INDEX_BLOCK].tolist()
+        return [self._account(account_id) for account_id in ids]
+
+    def _iter_snapshot(self, trapdoor: bytes, after: str, descending: bool):
+        # Decoded a block at a time under the lock, so a concurrent reload of
+        # the snapshot file never pulls the mapping out from under the walk.
+        while True:
+            with self._lock:
+                block = self._snapshot_block(trapdoor, after, descending)
+            yield from block
+            if len(block) < MEMORY_INDEX_BLOCK:
+                return
+            after = block[-1]
+
+    def iter_postings(self, trapdoor: bytes, after: str = None, descending: bool = False):
+        with self._lock:
+            added = [acc_no for acc_no in self._delta.get(trapdoor, ())
+                     if after is None or (acc_no < after if descending else acc_no > after)]
+            removed = set(self._removed.get(trapdoor, ()))
+        added.sort(reverse=descending)
+        merged = heapq.merge(self._iter_snapshot(trapdoor, after, descending), added,
+                             reverse=descending)
+        for acc_no in _dedupe(merged):
+            if acc_no not in removed:
+                yield acc_no
+
+    def iter_matches(self, conn, trapdoors: list, required: int, after: str = None,
+                     descending: bool = False):
+        self.refresh(conn)
+        streams = [self.iter_postings(trapdoor, after, descending) for trapdoor in trapdoors]
+        return merge_matches(streams, required, descending)
+
+def enable_memory_index(conn, path: str = None, rebuild: bool = False,
+                        auto_rebuild: bool = True):
+    # Serves searches on connections to conn's database from the snapshot.
+    db = database_id(conn)
+    path = index_snapshot_path(conn, path)
+    if rebuild or not os.path.exists(path):
+        build_index_snapshot(conn, path)
+    index = MemoryIndex(path)
+    index.refresh(conn, force=True)
+    disable_memory_index(conn)
+    memory_indexes[db] = index
+    if auto_rebuild and os.path.exists(db):
+        _index_rebuilders[db] = start_index_rebuilder(db)
+    return index
+
+def disable_memory_index(conn=None):
+    # For conn's database, or for every database when conn is None.
+    dbs = list(memory_indexes) if conn is None else [database_id(conn)]
+    for db in dbs:
+        rebuilder = _index_rebuilders.pop(db, None)
+        if rebuilder is not None:
+            rebuilder[1].set()
+        index = memory_indexes.pop(db, None)
+        if index is not None:
+            index.close()
+
+def start_index_rebuilder(path: str, interval: float = INDEX_REBUILD_CHECK_INTERVAL,
+                          max_rows: int = INDEX_LOG_REBUILD_ROWS) -> tuple:
+    # Rebuilds the snapshot of the vault at `path` on a daemon thread with its
+    # own connection whenever index_log has grown past max_rows.
+    # Returns (thread, stop_event).
+    stop_event = threading.Event()
+
+    def run():
+        conn = init_db(path)
+        try:
+            while not stop_event.wait(interval):
+                try:
+                    if index_log_rows(conn) >= max_rows:
+                        build_index_snapshot(conn)
+                except Exception:
+                    logging.exception("Index snapshot rebuild failed")
+        finally:
+            conn.close()
+
+    thread = threading.Thread(target=run, name="securevault-index-rebuild", daemon=True)
+    thread.start()
+    return thread, stop_event
+
+# =====================================================
+# BULK INGESTION
+# =====================================================
+
+INGEST_BATCH_SIZE = 5000
+SQLITE_MAX_VARS = 900
+
+def prepare_record(record: dict, ngrams: bool = False) -> tuple:
+    # CPU-bound half of an insert: serialize, encrypt and compute trapdoors.
+    return record["acc_no"], encrypt_payload(record), index_entries(record, ngrams)
+
+def _existing_accounts(cursor, acc_nos: list) -> set:
+    found = set()
+    for i in range(0, len(acc_nos), SQLITE_MAX_VARS):
+        chunk = acc_nos[i:i + SQLITE_MAX_VARS]
+        placeholders = ",".join("?" * len(chunk))
+        cursor.execute(
+            f"SELECT acc_no FROM data_store WHERE acc_no IN ({placeholders})",
+            chunk
+        )
+        found.update(row[0] for row in cursor.fetchall())
+    return found
+
+def write_batch(conn, prepared: list) -> tuple:
+    # Writes a batch of prepare_record() results in one transaction.
+    # Duplicate account numbers are skipped and returned instead of
+    # aborting the batch. Returns (inserted_count, duplicate_acc_nos).
+    cursor = conn.cursor()
+    if not conn.in_transaction:
+        cursor.execute("BEGIN IMMEDIATE")
+
+    try:
+        existing = _existing_accounts(cursor, [p[0] for p in prepared])
+        if existing:
+            existing -= _purge_tombstoned(cursor, list(existing))
+        if ngram_index_enabled(conn):
+            # Prepared before the n-gram index was switched on.
+            prepared = [(acc_no, blob, entries) if "ngram_index" in entries else
+                        (acc_no, blob, {**entries, "ngram_index": index_ngrams(decrypt_payload(blob))})
+                        for acc_no, blob, entries in prepared]
+
+        seen = set()
+        duplicates = []
+        payload_rows = []
+        index_rows = {}
+        for acc_no, blob, entries in prepared:
+            if acc_no in existing or acc_no in seen:
+                duplicates.append(acc_no)
+                continue
+            seen.add(acc_no)
+            payload_rows.append((acc_no, blob))
+            for table, trapdoors in entries.items():
+                index_rows.setdefault(table, []).extend(
+                    (trapdoor, acc_no) for trapdoor in trapdoors
+                )
+
+        cursor.executemany(
+            "INSERT INTO data_store (acc_no, payload) VALUES (?, ?)",
+            payload_rows
+        )
+        for table, rows in index_rows.items():
+            cursor.executemany(
+                f"INSERT INTO {table} (trapdoor, acc_no) VALUES (?, ?)",
+                rows
+            )
+        if index_rows.get("search_index") and _index_log_enabled(cursor):
+            cursor.executemany(
+                "INSERT INTO index_log (trapdoor, acc_no) VALUES (?, ?)",
+                index_rows["search_index"]
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    _index_changed(conn)
+    db = database_id(conn)
+    for acc_no, _ in payload_rows:
+        record_cache.invalidate(db, acc_no)
+
+    if duplicates:
+        logging.warning(f"Skipped {len(duplicates)} duplicate accounts in batch")
+    return len(payload_rows), duplicates
+
+def iter_batches(records, size: int):
+    it = iter(records)
+    while batch := list(islice(it, size)):
+        yield batch
+
+def prepare_batch(batch: list, ngrams: bool = False) -> list:
+    return [prepare_record(record, ngrams) for record in batch]
+
+INGEST_EXECUTORS = ("thread", "process")
+
+def ingest_pool(workers: int, executor: str = "thread"):
+    # Pool for prepare_batch(). Threads share this process's keys but only
+    # overlap where cryptography releases the GIL; processes scale with
+    # cores, and since every key is derived from the files in the working
+    # directory they compute identical blobs and trapdoors. The key files
+    # are created here first so worker processes never race to generate
+    # them.
+    if executor == "thread":
+        return ThreadPoolExecutor(max_workers=workers)
+    if executor == "process":
+        root_key()
+        global_salt()
+        active_key_version()
+        return ProcessPoolExecutor(max_workers=workers)
+    raise ValueError(f"executor must be one of {INGEST_EXECUTORS}")
+
+def insert_records(conn, records, batch_size: int = INGEST_BATCH_SIZE,
+                   workers: int = 1, executor: str = "thread") -> dict:
+    stats = {"inserted": 0, "duplicates": [], "batches": 0}
+
+    def flush(prepared):
+        inserted, duplicates = write_batch(conn, prepared)
+        stats["inserted"] += inserted
+        stats["duplicates"].extend(duplicates)
+        stats["batches"] += 1
+
+    ngrams = ngram_index_enabled(conn)
+    if workers <= 1:
+        for batch in iter_batches(records, batch_size):
+            flush(prepare_batch(batch, ngrams))
+    else:
+        # Encryption and trapdoor generation fan out to the pool while this
+        # thread stays the single SQLite writer. Batches are written in input
+        # order and at most 2 * workers batches are held in memory.
+        with ingest_pool(workers, executor) as pool:
+            pending = deque()
+            for batch in iter_batches(records, batch_size):
+                pending.append(pool.submit(prepare_batch, batch, ngrams))
+                if len(pending) >= workers * 2:
+                    flush(pending.popleft().result())
+            while pending:
+                flush(pending.popleft().result())
+
+    logging.info(f"Bulk inserted {stats['inserted']} records in {stats['batches']} batches")
+    return stats
+
+# =====================================================
+# SHARDED STORAGE
+# =====================================================
+#
+# data_store rows are placed by a keyed hash of acc_no and index rows by a
+# keyed hash of their trapdoor, across SHARD_COUNT SQLite files. Each shard is
+# served by one dedicated thread that owns its connection, so writes and
+# searches run on all shards at once, while each file still has one writer.
+# An insert writes payloads first, then index rows for the payloads that
+# were accepted. A crash between those steps leaves unindexed payloads, and
+# reshard() re-creates the index from them.
+#
+# ShardedVault has no update or delete path: an account's postings live on
+# other shards than its payload, so neither can be changed in one local
+# transaction. Inserting an existing account is skipped as a duplicate.
+# Apply updates and deletes to a single-file vault and reshard() it again;
+# tombstoned accounts are not copied.
+
+SHARD_COUNT = 4
+SHARD_FILE_PATTERN = "securevault.shard{:02d}.db"
+INDEX_TABLES = ("search_index", "ngram_index", "range_index")
+
+def shard_of(kind: bytes, key: bytes, shard_count: int) -> int:
+    digest = hmac.new(get_key("shard"), kind + b":" + key, hashlib.sha256).digest()
+    return int.from_bytes(digest[:8], "big") % shard_count
+
+def account_shard(acc_no: str, shard_count: int) -> int:
+    return shard_of(b"acc", acc_no.encode(), shard_count)
+
+def trapdoor_shard(trapdoor: bytes, shard_count: int) -> int:
+    return shard_of(b"td", trapdoor, shard_count)
+
+def _insert_new_payloads(conn, rows: list) -> list:
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        existing = _existing_accounts(cursor, [acc_no for acc_no, _ in rows])
+        fresh = [row for row in rows if row[0] not in existing]
+        cursor.executemany(
+            "INSERT INTO data_store (acc_no, payload) VALUES (?, ?)",
+            fresh
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return [acc_no for acc_no, _ in fresh]
+
+def _insert_index_rows(conn, index_rows: dict):
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        for table, rows in index_rows.items():
+            cursor.executemany(
+                f"INSERT OR IGNORE INTO {table} (trapdoor, acc_no) VALUES (?, ?)",
+                rows
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def _lookup_postings(conn, trapdoors: list) -> list:
+    placeholders = ",".join("?" * len(trapdoors))
+    cursor = conn.cursor()
+    cursor.execute(
+        f"SELECT trapdoor, acc_no FROM search_index WHERE trapdoor IN ({placeholders})",
+        trapdoors
+    )
+    return cursor.fetchall()
+
+class ShardedVault:
+
+    def __init__(self, shard_count: int = SHARD_COUNT,
+                 pattern: str = SHARD_FILE_PATTERN):
+        self.shard_count = shard_count
+        self.paths = [pattern.format(i) for i in range(shard_count)]
+        # Accounts are unique across the shard set, so one record-cache
+        # namespace covers all of its files.
+        self.cache_id = "shards:" + os.path.abspath(pattern)
+        self._executors = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"securevault-shard{i}")
+            for i in range(shard_count)
+        ]
+        # Connections are opened on the shard's own thread and never leave it.
+        self._conns = [
+            future.result() for future in
+            [executor.submit(init_db, path) for executor, path in zip(self._executors, self.paths)]
+        ]
+
+    def _fan_out(self, calls: dict) -> list:
+        # calls: {shard: (fn, *args)}; each runs as fn(conn, *args) on the
+        # shard's own thread. Returns the futures in call order.
+        return [
+            self._executors[shard].submit(fn, self._conns[shard], *args)
+            for shard, (fn, *args) in calls.items()
+        ]
+
+    def insert_records(self, records, batch_size: int = INGEST_BATCH_SIZE) -> dict:
+        stats = {"inserted": 0, "duplicates": [], "batches": 0}
+        ngrams = any(future.result() for future in self._fan_out(
+            {shard: (ngram_index_enabled,) for shard in range(self.shard_count)}))
+        for batch in iter_batches(records, batch_size):
+            prepared = {}
+            for acc_no, blob, entries in prepare_batch(batch, ngrams):
+                if acc_no in prepared:
+                    stats["duplicates"].append(acc_no)
+                    continue
+                prepared[acc_no] = (blob, entries)
+
+            payloads = {}
+            for acc_no, (blob, _) in prepared.items():
+                payloads.setdefault(account_shard(acc_no, self.shard_count), []).append((acc_no, blob))
+            inserted = []
+            for future in self._fan_out({shard: (_insert_new_payloads, rows)
+                                         for shard, rows in payloads.items()}):
+                inserted.extend(future.result())
+
+            index_rows = {}
+            for acc_no in inserted:
+                for table, trapdoors in prepared[acc_no][1].items():
+                    if table not in INDEX_TABLES:
+                        continue
+                    for trapdoor in trapdoors:
+                        shard = trapdoor_shard(trapdoor, self.shard_count)
+                        index_rows.setdefault(shard, {}).setdefault(table, []).append((trapdoor, acc_no))
+            for future in self._fan_out({shard: (_insert_index_rows, rows)
+                                         for shard, rows in index_rows.items()}):
+                future.result()
+
+            accepted = set(inserted)
+            stats["duplicates"].extend(acc_no for acc_no in prepared if acc_no not in accepted)
+            stats["inserted"] += len(inserted)
+            stats["batches"] += 1
+            for acc_no in inserted:
+                record_cache.invalidate(self.cache_id, acc_no)
+
+        logging.info(f"Sharded insert of {stats['inserted']} records across {self.shard_count} shards")
+        return stats
+
+    def insert_record(self, record: dict):
+        stats = self.insert_records([record])
+        if stats["duplicates"]:
+            logging.warning("Duplicate account insertion attempt")
+            raise sqlite3.IntegrityError("UNIQUE constraint failed: data_store.acc_no")
+
+    def search(self, query: str, match: str = "all", workers: int = 1) -> list:
+        trapdoors = query_trapdoors(query)
+        required = _required_terms(trapdoors, match)
+        if not trapdoors:
+            return []
+
+        by_shard = {}
+        for trapdoor in trapdoors:
+            by_shard.setdefault(trapdoor_shard(trapdoor, self.shard_count), []).append(trapdoor)
+        postings = {trapdoor: set() for trapdoor in trapdoors}
+        for future in self._fan_out({shard: (_lookup_postings, tds)
+                                     for shard, tds in by_shard.items()}):
+            for trapdoor, acc_no in future.result():
+                postings[trapdoor].add(acc_no)
+
+        sets = sorted(postings.values(), key=len)
+        hits = set.intersection(*sets) if required > 1 else set.union(*sets)
+
+        by_shard = {}
+        for acc_no in hits:
+            by_shard.setdefault(account_shard(acc_no, self.shard_count), []).append(acc_no)
+        rows = []
+        for future in self._fan_out({shard: (fetch_payloads, acc_nos)
+                                     for shard, acc_nos in by_shard.items()}):
+            rows.extend(future.result())
+
+        logging.info("Sharded search performed securely")
+        return load_records(self.cache_id, sorted(rows), workers)
+
+    def close(self):
+        for shard, executor in enumerate(self._executors):
+            executor.submit(self._conns[shard].close).result()
+            executor.shutdown()
+
+def reshard(source_paths: list, target: ShardedVault,
+            batch_size: int = INGEST_BATCH_SIZE) -> dict:
+    # Offline copy from any set of vault files (a single securevault.db or an
+    # older shard set) into `target`. Rows are moved as stored, so nothing is
+    # decrypted or re-encrypted, and packed posting lists are unpacked back
+    # into plain index rows. Tombstoned accounts and their postings are left
+    # behind.
+    stats = {"records": 0, "postings": 0}
+    deleted = set()
+    for path in source_paths:
+        source = sqlite3.connect(path)
+        try:
+            if source.execute("SELECT 1 FROM sqlite_master WHERE name = 'tombstones'").fetchone():
+                deleted.update(row[0] for row in source.execute("SELECT acc_no FROM tombstones"))
+        finally:
+            source.close()
+
+    for path in source_paths:
+        source = sqlite3.connect(path)
+        try:
+            cursor = source.cursor()
+            cursor.execute("SELECT acc_no, payload FROM data_store")
+            while rows := cursor.fetchmany(batch_size):
+                payloads = {}
+                for acc_no, blob in rows:
+                    if acc_no in deleted:
+                        continue
+                    payloads.setdefault(account_shard(acc_no, target.shard_count), []).append((acc_no, blob))
+                for future in target._fan_out({shard: (_insert_new_payloads, shard_rows)
+                                               for shard, shard_rows in payloads.items()}):
+                    stats["records"] += len(future.result())
+
+            tables = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            for table in INDEX_TABLES + ("posting_lists",):
+                if table not in tables:
+                    continue
+                if table == "posting_lists":
+                    cursor.execute("SELECT trapdoor, postings FROM posting_lists")
+                    dest = "search_index"
+                else:
+                    cursor.execute(f"SELECT trapdoor, acc_no FROM {table}")
+                    dest = table
+                while rows := cursor.fetchmany(batch_size):
+                    if table == "posting_lists":
+                        rows = [(trapdoor, acc_no) for trapdoor, blob in rows
+                                for acc_no in decode_postings(blob)]
+                    index_rows = {}
+                    for trapdoor, acc_no in rows:
+                        if acc_no in deleted:
+                            continue
+                        shard = trapdoor_shard(trapdoor, target.shard_count)
+                        index_rows.setdefault(shard, {}).setdefault(dest, []).append((trapdoor, acc_no))
+                        stats["postings"] += 1
+                    for future in target._fan_out({shard: (_insert_index_rows, shard_rows)
+                                                   for shard, shard_rows in index_rows.items()}):
+                        future.result()
+        finally:
+            source.close()
+
+    logging.info(f"Resharded {stats['records']} records into {target.shard_count} shards")
+    return stats
+
 # =====================================================
-# STREAMLIT UI
+# RECORD UPDATES & DELETES
 # =====================================================
+#
+# update_record() diffs the old and new index entries and only touches the
+# postings that changed. delete_record() just writes a tombstone, which every
+# read path filters out; compact_tombstones() later removes the postings and
+# payloads of tombstoned accounts in short batches. Inserting a tombstoned
+# account again purges the old one first.
+
+TOMBSTONE_BATCH_SIZE = 200
+TOMBSTONE_PAUSE = 0.05
+TOMBSTONE_COMPACTION_INTERVAL = 60.0
+VACUUM_PAGES_PER_BATCH = 512
+
+def _log_postings(cursor, trapdoors, acc_no: str, op: int):
+    if trapdoors and _index_log_enabled(cursor):
+        cursor.executemany(
+            "INSERT INTO index_log (trapdoor, acc_no, op) VALUES (?, ?, ?)",
+            [(trapdoor, acc_no, op) for trapdoor in trapdoors]
+        )
+
+def _remove_packed(cursor, trapdoor: bytes, acc_no: str):
+    # Rewrites only the one chunk whose range covers acc_no.
+    cursor.execute("""
+        SELECT first_acc, postings FROM posting_lists
+        WHERE trapdoor = ? AND first_acc <= ?
+        ORDER BY first_acc DESC LIMIT 1
+    """, (trapdoor, acc_no))
+    row = cursor.fetchone()
+    if row is None:
+        return
+    first_acc, blob = row
+    acc_nos = decode_postings(blob)
+    i = bisect_right(acc_nos, acc_no) - 1
+    if i < 0 or acc_nos[i] != acc_no:
+        return
+    del acc_nos[i]
+
+    cursor.execute(
+        "DELETE FROM posting_lists WHERE trapdoor = ? AND first_acc = ?",
+        (trapdoor, first_acc)
+    )
+    if acc_nos:
+        cursor.execute(
+            "INSERT INTO posting_lists (trapdoor, first_acc, count, postings) VALUES (?, ?, ?, ?)",
+            (trapdoor, acc_nos[0], len(acc_nos), encode_postings(acc_nos))
+        )
+
+def _remove_postings(cursor, table: str, trapdoors, acc_no: str):
+    if not trapdoors:
+        return
+    cursor.executemany(
+        f"DELETE FROM {table} WHERE trapdoor = ? AND acc_no = ?",
+        [(trapdoor, acc_no) for trapdoor in trapdoors]
+    )
+    if table == "search_index":
+        for trapdoor in trapdoors:
+            _remove_packed(cursor, trapdoor, acc_no)
+        _log_postings(cursor, trapdoors, acc_no, -1)
+
+def _scan_entries(cursor, acc_no: str) -> dict:
+    # Fallback for payloads no key version can decrypt: find the account's
+    # postings by scanning instead of recomputing them.
+    entries = {}
+    for table in INDEX_TABLES:
+        cursor.execute(f"SELECT trapdoor FROM {table} WHERE acc_no = ?", (acc_no,))
+        entries[table] = {row[0] for row in cursor.fetchall()}
+    cursor.execute("""
+        SELECT trapdoor, MAX(first_acc), postings FROM posting_lists
+        WHERE first_acc <= ?
+        GROUP BY trapdoor
+    """, (acc_no,))
+    for trapdoor, _, blob in cursor.fetchall():
+        if acc_no in decode_postings(blob):
+            entries["search_index"].add(trapdoor)
+    return entries
 
-st.set_page_config(page_title="SecureVault Enterprise", layout="wide")
-st.title("SecureVault Enterprise - Industry Grade Secure Search")
+def _stored_entries(cursor, acc_no: str, blob: bytes) -> dict:
+    try:
+        return index_entries(decrypt_payload(blob), ngrams=True)
+    except invalid_token_error():
+        logging.warning("Scanning indexes for a payload no key version can decrypt")
+        return _scan_entries(cursor, acc_no)
+
+def update_record(conn, record: dict):
+    acc_no = record["acc_no"]
+    encrypted_blob = encrypt_payload(record)
+
+    cursor = conn.cursor()
+    if not conn.in_transaction:
+        cursor.execute("BEGIN IMMEDIATE")
+    try:
+        new_entries = index_entries(record, ngram_index_enabled(conn))
+        cursor.execute("""
+            SELECT payload FROM data_store
+            WHERE acc_no = ? AND NOT EXISTS (SELECT 1 FROM tombstones WHERE acc_no = ?)
+        """, (acc_no, acc_no))
+        row = cursor.fetchone()
+        if row is None:
+            raise KeyError(acc_no)
+        # Every old posting is looked for, including n-grams written while
+        # the index was on, so a since-disabled index keeps no stale terms.
+        old_entries = _stored_entries(cursor, acc_no, row[0])
 
-conn = init_db()
+        for table in INDEX_TABLES:
+            old = old_entries.get(table, set())
+            new = new_entries.get(table, set())
+            _remove_postings(cursor, table, old - new, acc_no)
+            added = new - old
+            cursor.executemany(
+                f"INSERT OR IGNORE INTO {table} (trapdoor, acc_no) VALUES (?, ?)",
+                [(trapdoor, acc_no) for trapdoor in added]
+            )
+            if table == "search_index":
+                _log_postings(cursor, added, acc_no, 1)
 
-st.sidebar.header("Add Secure Record")
+        cursor.execute(
+            "UPDATE data_store SET payload = ? WHERE acc_no = ?",
+            (encrypted_blob, acc_no)
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
 
-name = st.sidebar.text_input("Customer Name")
-acc_no = st.sidebar.text_input("Account Number")
-balance = st.sidebar.text_input("Balance")
+    _index_changed(conn)
+    record_cache.invalidate(database_id(conn), acc_no)
+    logging.info("Updated record securely")
 
-if st.sidebar.button("Store Securely"):
+def delete_records(conn, acc_nos) -> int:
+    # Tombstones every live account in acc_nos in one transaction and returns
+    # how many were deleted.
+    acc_nos = list(dict.fromkeys(acc_nos))
+    cursor = conn.cursor()
+    if not conn.in_transaction:
+        cursor.execute("BEGIN IMMEDIATE")
     try:
-        insert_record(conn, {
-            "name": name,
-            "acc_no": acc_no,
-            "balance": balance
-        })
-        st.success("Securely stored.")
-    except:
-        st.error("Account already exists.")
-
-st.header("Secure Search")
-
-query = st.text_input("Search by Name or Account Number")
-
-if st.button("Search"):
-    results = search_records(conn, query)
-    if results:
-        for r in results:
-            st.json(r)
+        live = _existing_accounts(cursor, acc_nos)
+        now = time.time()
+        cursor.executemany(
+            "INSERT OR IGNORE INTO tombstones (acc_no, deleted_at) VALUES (?, ?)",
+            [(acc_no, now) for acc_no in acc_nos if acc_no in live]
+        )
+        deleted = cursor.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    db = database_id(conn)
+    for acc_no in acc_nos:
+        record_cache.invalidate(db, acc_no)
+    logging.info(f"Deleted {deleted} records")
+    return deleted
+
+def delete_record(conn, acc_no: str) -> bool:
+    return delete_records(conn, [acc_no]) == 1
+
+def _purge_accounts(cursor, acc_nos: list):
+    # Must run inside a write transaction.
+    for acc_no in acc_nos:
+        cursor.execute("SELECT payload FROM data_store WHERE acc_no = ?", (acc_no,))
+        row = cursor.fetchone()
+        if row is not None:
+            entries = _stored_entries(cursor, acc_no, row[0])
+            for table in INDEX_TABLES:
+                _remove_postings(cursor, table, entries.get(table), acc_no)
+            cursor.execute("DELETE FROM data_store WHERE acc_no = ?", (acc_no,))
+        cursor.execute("DELETE FROM tombstones WHERE acc_no = ?", (acc_no,))
+
+def _purge_tombstoned(cursor, acc_nos: list) -> set:
+    # Purges the tombstoned accounts among acc_nos so they can be re-inserted.
+    found = set()
+    for i in range(0, len(acc_nos), SQLITE_MAX_VARS):
+        chunk = acc_nos[i:i + SQLITE_MAX_VARS]
+        placeholders = ",".join("?" * len(chunk))
+        cursor.execute(
+            f"SELECT acc_no FROM tombstones WHERE acc_no IN ({placeholders})",
+            chunk
+        )
+        found.update(row[0] for row in cursor.fetchall())
+    _purge_accounts(cursor, sorted(found))
+    return found
+
+def compact_tombstones(conn, batch_size: int = TOMBSTONE_BATCH_SIZE,
+                       pause: float = TOMBSTONE_PAUSE, stop_event=None) -> dict:
+    # Each batch is its own short write transaction, so searches and inserts
+    # interleave with a long-running compaction.
+    cursor = conn.cursor()
+    stats = {"purged": 0, "batches": 0}
+
+    while not (stop_event and stop_event.is_set()):
+        cursor.execute(
+            "SELECT acc_no FROM tombstones ORDER BY acc_no LIMIT ?",
+            (batch_size,)
+        )
+        acc_nos = [row[0] for row in cursor.fetchall()]
+        if not acc_nos:
+            break
+
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            _purge_accounts(cursor, acc_nos)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        stats["purged"] += len(acc_nos)
+        stats["batches"] += 1
+
+        # A no-op unless the file was created with auto_vacuum = INCREMENTAL.
+        # executescript() steps the pragma to completion; execute() would
+        # free a single page.
+        conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_PAGES_PER_BATCH});")
+        if pause:
+            time.sleep(pause)
+
+    if stats["purged"]:
+        logging.info(f"Compacted {stats['purged']} deleted records")
+    return stats
+
+def start_tombstone_compaction(interval: float = TOMBSTONE_COMPACTION_INTERVAL,
+                               **kwargs) -> tuple:
+    # Runs compact_tombstones every `interval` seconds on a daemon thread with
+    # its own connection. Returns (thread, stop_event).
+    stop_event = threading.Event()
+
+    def run():
+        conn = init_db()
+        try:
+            while True:
+                compact_tombstones(conn, stop_event=stop_event, **kwargs)
+                if stop_event.wait(interval):
+                    break
+        finally:
+            conn.close()
+
+    thread = threading.Thread(target=run, name="securevault-compaction", daemon=True)
+    thread.start()
+    return thread, stop_event
+
+# =====================================================
+# KEY ROTATION
+# =====================================================
+
+KEY_ROTATION_BATCH_SIZE = 500
+KEY_ROTATION_PAUSE = 0.05
+
+def _has_stale_payloads(cursor, target_version: int) -> bool:
+    cursor.execute(
+        "SELECT 1 FROM data_store WHERE substr(payload, 1, 1) != ? LIMIT 1",
+        (bytes([target_version]),)
+    )
+    return cursor.fetchone() is not None
+
+def rotate_keys(conn, target_version: int = None,
+                batch_size: int = KEY_ROTATION_BATCH_SIZE,
+                pause: float = KEY_ROTATION_PAUSE, stop_event=None) -> dict:
+    # Re-encrypts data_store under target_version in acc_no order, making it
+    # the active version first so new writes stop adding work. Progress is
+    # committed with every batch, so an interrupted run resumes where it
+    # stopped. A finished pass resets the cursor; while any payload is still
+    # under another version (written behind the cursor by a process that had
+    # not yet seen the switch), another pass starts. A full pass re-encrypting
+    # nothing ends the run, so payloads no version can decrypt do not loop.
+    # Readers are never blocked for longer than one batch update.
+    target_version = active_key_version() if target_version is None else target_version
+    get_cipher(target_version)
+    if target_version != active_key_version():
+        set_active_key_version(target_version)
+
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT last_acc_no, rotated FROM key_rotation WHERE target_version = ?",
+        (target_version,)
+    )
+    progress = cursor.fetchone()
+    last_acc_no, rotated = progress if progress else (None, 0)
+    stats = {"rotated": 0, "unreadable": 0, "passes": 0, "done": False}
+    full_pass, pass_rotated = last_acc_no is None, 0
+
+    if last_acc_no is None and not _has_stale_payloads(cursor, target_version):
+        stats["done"] = True
+
+    while not stats["done"] and not (stop_event and stop_event.is_set()):
+        if last_acc_no is None:
+            cursor.execute(
+                "SELECT acc_no, payload FROM data_store ORDER BY acc_no LIMIT ?",
+                (batch_size,)
+            )
+        else:
+            cursor.execute(
+                "SELECT acc_no, payload FROM data_store WHERE acc_no > ? ORDER BY acc_no LIMIT ?",
+                (last_acc_no, batch_size)
+            )
+        rows = cursor.fetchall()
+
+        updates = []
+        for acc_no, blob in rows:
+            if blob[0] == target_version:
+                continue
+            try:
+                record = decrypt_payload(blob)
+            except invalid_token_error():
+                stats["unreadable"] += 1
+                logging.warning("Skipping payload that no key version can decrypt")
+                continue
+            updates.append((encrypt_payload(record, target_version), acc_no, blob))
+
+        # An empty batch ends the pass; the cursor goes back to the start.
+        last_acc_no = rows[-1][0] if rows else None
+        rotated += len(updates)
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            # Matching on the old blob skips rows rewritten since we read them.
+            cursor.executemany(
+                "UPDATE data_store SET payload = ? WHERE acc_no = ? AND payload = ?",
+                updates
+            )
+            cursor.execute("""
+                INSERT INTO key_rotation (target_version, last_acc_no, rotated)
+                VALUES (?, ?, ?)
+                ON CONFLICT(target_version) DO UPDATE SET
+                    last_acc_no = excluded.last_acc_no,
+                    rotated = excluded.rotated
+            """, (target_version, last_acc_no, rotated))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        stats["rotated"] += len(updates)
+        pass_rotated += len(updates)
+
+        if not rows:
+            stats["passes"] += 1
+            if (full_pass and not pass_rotated) or not _has_stale_payloads(cursor, target_version):
+                stats["done"] = True
+                break
+            full_pass, pass_rotated = True, 0
+            continue
+
+        if pause:
+            time.sleep(pause)
+
+    logging.info(f"Key rotation to v{target_version}: {stats['rotated']} payloads re-encrypted")
+    return stats
+
+def start_key_rotation(target_version: int = None, **kwargs) -> tuple:
+    # Runs rotate_keys on a daemon thread with its own connection.
+    # Returns (thread, stop_event); set the event to pause the rotation.
+    stop_event = threading.Event()
+
+    def run():
+        conn = init_db()
+        try:
+            rotate_keys(conn, target_version, stop_event=stop_event, **kwargs)
+        finally:
+            conn.close()
+
+    thread = threading.Thread(target=run, name="securevault-key-rotation", daemon=True)
+    thread.start()
+    return thread, stop_event
+
+# =====================================================
+# ASYNC API
+# =====================================================
+#
+# AsyncVault runs engine calls on a bounded thread pool, plus one writer
+# thread so inserts never contend for the SQLite write lock. Each worker
+# thread opens its own connection on first use. Callers that are waiting,
+# even thousands of them, are plain coroutines queued on a semaphore; none
+# of them owns a thread. When a call hits its deadline or is cancelled and
+# has not started yet, it is dropped. A running read has its connection
+# interrupted, which aborts the in-flight SQL statement; a running write is
+# left to finish, so a deadline never leaves a write's outcome unknown.
+# asyncio is imported on first use; it is the largest import in the engine.
+
+ASYNC_WORKERS = 8
+ASYNC_MAX_PENDING = 10_000
+
+class AsyncVault:
+
+    def __init__(self, path: str = None, workers: int = ASYNC_WORKERS,
+                 max_pending: int = ASYNC_MAX_PENDING, timeout: float = None):
+        self.path = path
+        self.timeout = timeout
+        self._readers = ThreadPoolExecutor(max_workers=workers,
+                                           thread_name_prefix="securevault-async")
+        self._writer = ThreadPoolExecutor(max_workers=1,
+                                          thread_name_prefix="securevault-async-writer")
+        import asyncio
+        self._slots = asyncio.Semaphore(max_pending)
+        self._local = threading.local()
+        self._conns = []
+        self._conns_lock = threading.Lock()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = init_db(self.path, check_same_thread=False)
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    async def _call(self, executor, fn, *args, timeout: float = None, write: bool = False,
+                    cancellable: bool = False):
+        # Writes are never interrupted: an abort could land after the commit
+        # and report a failure for a write that happened. Their deadline only
+        # covers the time spent queued; once a write has started it runs to
+        # completion and its result is returned even if the deadline passed.
+        # Cancelling the caller still waits for a started write, then raises.
+        # An abandoned read is interrupted in SQL and, when `cancellable`
+        # (fn takes a `cancel` event), stopped between decrypt chunks too.
+        import asyncio
+        timeout = self.timeout if timeout is None else timeout
+        state = {"conn": None, "started": False, "abandoned": False}
+        cancel = threading.Event()
+        lock = threading.Lock()
+
+        def job():
+            with lock:
+                if state["abandoned"] or cancel.is_set():
+                    return None
+                state["started"] = True
+            conn = self._connection()
+            with lock:
+                state["conn"] = conn
+            try:
+                if cancellable:
+                    return fn(conn, *args, cancel=cancel)
+                return fn(conn, *args)
+            finally:
+                with lock:
+                    state["conn"] = None
+
+        async def submit():
+            async with self._slots:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(executor, job)
+
+        task = asyncio.ensure_future(submit())
+        try:
+            return await asyncio.wait_for(asyncio.shield(task) if write else task, timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError) as exc:
+            if not write:
+                with lock:
+                    cancel.set()
+                    if state["conn"] is not None:
+                        state["conn"].interrupt()
+                raise
+            with lock:
+                state["abandoned"] = not state["started"]
+            if state["abandoned"]:
+                task.cancel()
+                raise
+            result = await asyncio.shield(task)
+            if isinstance(exc, asyncio.TimeoutError):
+                return result
+            raise
+
+    async def insert(self, record: dict, timeout: float = None):
+        return await self._call(self._writer, insert_record, record,
+                                timeout=timeout, write=True)
+
+    async def insert_many(self, records: list, batch_size: int = INGEST_BATCH_SIZE,
+                          timeout: float = None) -> dict:
+        return await self._call(self._writer, insert_records, records, batch_size,
+                                timeout=timeout, write=True)
+
+    async def search(self, query: str, match: str = "all", timeout: float = None,
+                     limit: int = None, order: str = "asc") -> list:
+        return await self._call(self._readers, search_records, query, match, 1,
+                                limit, order, timeout=timeout, cancellable=True)
+
+    async def count(self, query: str, match: str = "all", timeout: float = None) -> int:
+        return await self._call(self._readers, count_matches, query, match,
+                                timeout=timeout)
+
+    async def stream(self, query: str, match: str = "all",
+                     page_size: int = SEARCH_PAGE_SIZE, timeout: float = None):
+        # Async generator over keyset pages; `timeout` applies per page.
+        token = None
+        while True:
+            records, token = await self._call(self._readers, search_page, query,
+                                              page_size, token, match, timeout=timeout,
+                                              cancellable=True)
+            for record in records:
+                yield record
+            if token is None:
+                return
+
+    async def aclose(self):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._readers.shutdown)
+        await loop.run_in_executor(None, self._writer.shutdown)
+        with self._conns_lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+# =====================================================
+# INSTRUMENTATION
+# =====================================================
+#
+# enable_metrics() swaps the functions below for timed wrappers in this
+# module's namespace; disable_metrics() swaps the originals back. While
+# disabled nothing is wrapped, so the hot paths run exactly as before.
+# Nested metrics overlap: "search" includes "search.sql" and
+# "search.decrypt", and "decrypt" is "decrypt.fernet" plus "decrypt.json".
+#
+# SECUREVAULT_METRICS=1 in the environment enables metrics when the module is
+# imported; SECUREVAULT_METRICS_PORT additionally serves them on localhost.
+
+METRICS_ENABLED = os.environ.get("SECUREVAULT_METRICS", "").lower() in ("1", "true", "yes", "on")
+METRICS_PORT = int(os.environ["SECUREVAULT_METRICS_PORT"]) \
+    if os.environ.get("SECUREVAULT_METRICS_PORT") else None
+
+INSTRUMENTED_FUNCTIONS = {
+    "generate_trapdoor": "trapdoor",
+    "search_records": "search",
+    "count_matches": "search.count",
+    "match_rows": "search.sql",
+    "fetch_payloads": "search.fetch",
+    "load_records": "search.decrypt",
+    "decrypt_payload": "decrypt",
+    "decrypt_token": "decrypt.fernet",
+    "decode_record": "decrypt.json",
+    "insert_record": "insert",
+    "encrypt_payload": "insert.encrypt",
+    "commit_insert": "insert.commit",
+    "write_batch": "ingest.write_batch",
+}
+
+metrics_server = None
+
+def _cache_gauges() -> dict:
+    return {f"record_cache.{key}": value for key, value in record_cache.stats().items()}
+
+def enable_metrics(port: int = None):
+    global metrics_server
+    instrument(globals(), INSTRUMENTED_FUNCTIONS)
+    if _cache_gauges not in metrics_registry.collectors:
+        metrics_registry.add_collector(_cache_gauges)
+    if port is not None and metrics_server is None:
+        metrics_server = serve_metrics(metrics_registry, port=port)
+    return metrics_registry
+
+def disable_metrics():
+    global metrics_server
+    uninstrument(globals(), INSTRUMENTED_FUNCTIONS)
+    if metrics_server is not None:
+        metrics_server.shutdown()
+        metrics_server.server_close()
+        metrics_server = None
+
+def dump_metrics(path: str = None) -> str:
+    data = metrics_registry.to_json()
+    if path is not None:
+        with open(path, "w") as f:
+            f.write(data)
+    return data
+
+if METRICS_ENABLED:
+    enable_metrics(METRICS_PORT)
+
+if __name__ == "__main__":
+    streamlit = sys.modules.get("streamlit")
+    if streamlit is not None and streamlit.runtime.exists():
+        # `streamlit run securevault.py` keeps working.
+        from securevault_ui import run_ui
+        run_ui()
     else:
-        st.error("No results found.")
\ No newline at end of file
+        # `python securevault.py import ...` keeps working. The CLI imports
+        # this file as `securevault`; aliasing it first stops a second copy
+        # of the engine (and its metrics server) from being loaded.
+        sys.modules.setdefault("securevault", sys.modules[__name__])
+        from securevault_cli import cli_main
+        sys.exit(cli_main())
@@ -0,0 +1,287 @@
+"""
+SecureVault — Command-Line Interface
+Bulk import, backup and restore for a vault database. `python securevault.py`
+forwards here, so both spellings of each command work.
+
+    python securevault_cli.py import accounts.csv [--dry-run]
+    zcat accounts.jsonl.gz | python securevault_cli.py import - --format jsonl \\
+        --checkpoint accounts.ckpt
+    python securevault_cli.py backup /backups/vault [--full]
+    python securevault_cli.py restore /backups/vault restored.db [--snapshot N]
+
+import streams rows, so memory use is bounded by the batches in flight.
+After every committed batch the byte offset just past it is written to the
+checkpoint file; re-running the same command resumes from there. Only the
+acc_no, name and balance fields are imported.
+"""
+
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+
+from securevault import (
+    DB_FILE, INGEST_BATCH_SIZE, INGEST_EXECUTORS, configure_logging, ingest_pool,
+    init_db, iter_batches, ngram_index_enabled, prepare_batch, write_batch
+)
+from utils.backup import backup_vault, list_snapshots, restore_vault
+
+IMPORT_FIELDS = ("acc_no", "name", "balance")
+IMPORT_PROGRESS_INTERVAL = 1.0
+IMPORT_MAX_REPORTED_ERRORS = 20
+
+def _read_lines(stream, state: dict):
+    # Yields decoded lines while keeping state["offset"] just past the last.
+    for raw in stream:
+        if state["offset"] == 0 and raw.startswith(b"\xef\xbb\xbf"):
+            state["offset"] += 3
+            raw = raw[3:]
+        state["offset"] += len(raw)
+        yield raw.decode("utf-8")
+
+def _skip_to(stream, offset: int):
+    if stream.seekable():
+        stream.seek(offset)
+        return
+    remaining = offset
+    while remaining:
+        chunk = stream.read(min(remaining, 1 << 20))
+        if not chunk:
+            raise ValueError("Input is shorter than the checkpoint offset")
+        remaining -= len(chunk)
+
+def _parse_rows(lines, fmt: str, state: dict):
+    # Yields (row, error) pairs; exactly one of them is None.
+    if fmt == "csv":
+        reader = csv.DictReader(lines, fieldnames=state.get("fieldnames"))
+        for row in reader:
+            state["fieldnames"] = reader.fieldnames
+            yield row, None
+    else:
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield None, f"invalid JSON: {e.msg}"
+                continue
+            if isinstance(row, dict):
+                yield row, None
+            else:
+                yield None, "expected a JSON object"
+
+def validate_import_row(row: dict) -> dict:
+    record = {}
+    for field in IMPORT_FIELDS:
+        value = row.get(field)
+        value = "" if value is None else str(value).strip()
+        if not value:
+            raise ValueError(f"missing {field}")
+        record[field] = value
+    return record
+
+def _import_records(rows, state: dict, stats: dict):
+    for row, error in rows:
+        stats["rows"] += 1
+        if error is None:
+            try:
+                yield state["offset"], validate_import_row(row)
+                continue
+            except ValueError as e:
+                error = str(e)
+        stats["rejected"] += 1
+        if stats["rejected"] <= IMPORT_MAX_REPORTED_ERRORS:
+            prefix = "\n" if sys.stderr.isatty() else ""
+            print(f"{prefix}row {stats['rows']}: {error}", file=sys.stderr)
+
+def _load_checkpoint(path: str, source: str) -> dict:
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("source") != source:
+        raise ValueError(f"Checkpoint {path} belongs to {checkpoint.get('source')}")
+    return checkpoint
+
+def _save_checkpoint(path: str, checkpoint: dict):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+def _report_progress(stats: dict, started: float, final: bool = False):
+    elapsed = max(time.monotonic() - started, 1e-9)
+    line = (f"{stats['rows']:,} rows read, {stats['inserted']:,} inserted, "
+            f"{stats['duplicates']:,} duplicates, {stats['rejected']:,} rejected "
+            f"({stats['rows_this_run'] / elapsed:,.0f} rows/s)")
+    end = "\n" if final or not sys.stderr.isatty() else ""
+    print(f"\r{line}", end=end, file=sys.stderr, flush=True)
+
+def import_stream(conn, stream, fmt: str, source: str, checkpoint_path: str = None,
+                  batch_size: int = INGEST_BATCH_SIZE, workers: int = 1,
+                  dry_run: bool = False, executor: str = "thread") -> dict:
+    checkpoint = _load_checkpoint(checkpoint_path, source) or {}
+    state = {"offset": checkpoint.get("offset", 0),
+             "fieldnames": checkpoint.get("fieldnames")}
+    stats = {key: checkpoint.get(key, 0)
+             for key in ("rows", "inserted", "duplicates", "rejected")}
+    if state["offset"]:
+        print(f"Resuming {source} at byte {state['offset']:,}", file=sys.stderr)
+        _skip_to(stream, state["offset"])
+
+    rows_before = stats["rows"]
+    started = time.monotonic()
+    last_report = started
+
+    def commit(prepared, resume_at):
+        # resume_at is (offset, rows, rejected) as of the batch's last row.
+        inserted, duplicates = write_batch(conn, prepared)
+        stats["inserted"] += inserted
+        stats["duplicates"] += len(duplicates)
+        if checkpoint_path:
+            offset, rows, rejected = resume_at
+            _save_checkpoint(checkpoint_path, {
+                "source": source, "offset": offset, "fieldnames": state["fieldnames"],
+                "rows": rows, "rejected": rejected,
+                "inserted": stats["inserted"], "duplicates": stats["duplicates"],
+            })
+
+    records = _import_records(_parse_rows(_read_lines(stream, state), fmt, state),
+                              state, stats)
+    ngrams = not dry_run and ngram_index_enabled(conn)
+    # As in insert_records(), encryption runs on the pool while this thread
+    # writes batches in input order, with at most 2 * workers in flight.
+    # A dry run submits nothing, so it never needs keys or worker processes.
+    with ingest_pool(max(workers, 1), "thread" if dry_run else executor) as pool:
+        pending = deque()
+        for batch in iter_batches(records, batch_size):
+            resume_at = (batch[-1][0], stats["rows"], stats["rejected"])
+            if not dry_run:
+                pending.append((pool.submit(prepare_batch, [r for _, r in batch], ngrams),
+                                resume_at))
+                if len(pending) >= max(workers, 1) * 2:
+                    future, resume_at = pending.popleft()
+                    commit(future.result(), resume_at)
+
+            stats["rows_this_run"] = stats["rows"] - rows_before
+            if time.monotonic() - last_report >= IMPORT_PROGRESS_INTERVAL:
+                _report_progress(stats, started)
+                last_report = time.monotonic()
+
+        while pending:
+            future, resume_at = pending.popleft()
+            commit(future.result(), resume_at)
+
+    stats["rows_this_run"] = stats["rows"] - rows_before
+    _report_progress(stats, started, final=True)
+    if checkpoint_path and not dry_run and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    logging.info(f"Imported {stats['inserted']} records from {source}")
+    return stats
+
+def cli_import(args) -> int:
+    fmt = args.format
+    if fmt is None:
+        if args.source.endswith((".jsonl", ".ndjson")):
+            fmt = "jsonl"
+        elif args.source.endswith(".csv"):
+            fmt = "csv"
+        else:
+            print("Cannot infer the input format; pass --format", file=sys.stderr)
+            return 2
+
+    checkpoint_path = args.checkpoint
+    if checkpoint_path is None and args.source != "-":
+        checkpoint_path = args.source + ".checkpoint"
+    source = "-" if args.source == "-" else os.path.abspath(args.source)
+
+    conn = None if args.dry_run else init_db(args.db)
+    stream = sys.stdin.buffer if args.source == "-" else open(args.source, "rb")
+    try:
+        stats = import_stream(conn, stream, fmt, source,
+                              None if args.dry_run else checkpoint_path,
+                              args.batch_size, args.workers, args.dry_run,
+                              args.executor)
+    except KeyboardInterrupt:
+        print("\nInterrupted; re-run the same command to resume.", file=sys.stderr)
+        return 130
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+        if conn is not None:
+            conn.close()
+    return 1 if args.dry_run and stats["rejected"] else 0
+
+def cli_backup(args) -> int:
+    stats = backup_vault(args.backup_dir, args.db, full=args.full)
+    kind = "full" if stats["parent"] is None else f"incremental on {stats['parent']}"
+    print(f"Snapshot {stats['id']} ({kind}): {stats['pages']:,} of "
+          f"{stats['page_count']:,} pages, {stats['bytes']:,} bytes")
+    return 0
+
+def cli_restore(args) -> int:
+    if args.list:
+        for snapshot in list_snapshots(args.backup_dir).values():
+            created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(snapshot["created"]))
+            parent = "full" if snapshot["parent"] is None else f"parent {snapshot['parent']}"
+            print(f"{snapshot['id']:>6}  {created}  {parent:<12} {snapshot['bytes']:>14,} bytes")
+        return 0
+    if args.target is None:
+        print("restore needs a TARGET file (or --list)", file=sys.stderr)
+        return 2
+    try:
+        stats = restore_vault(args.backup_dir, args.target, args.snapshot)
+    except FileExistsError as e:
+        print(f"{e} already exists; restore into a new file", file=sys.stderr)
+        return 1
+    except (FileNotFoundError, KeyError) as e:
+        print(f"No such snapshot: {e}", file=sys.stderr)
+        return 1
+    print(f"Restored snapshot {stats['id']} to {args.target} from {stats['segments']} segments")
+    return 0
+
+def cli_main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="securevault")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    importer = commands.add_parser("import", help="bulk import CSV or JSONL records")
+    importer.add_argument("source", help="input file, or - for stdin")
+    importer.add_argument("--format", choices=("csv", "jsonl"))
+    importer.add_argument("--db", default=DB_FILE)
+    importer.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    importer.add_argument("--workers", type=int, default=1)
+    importer.add_argument("--executor", choices=INGEST_EXECUTORS, default="thread",
+                          help="run encryption on threads or worker processes")
+    importer.add_argument("--checkpoint",
+                          help="resume file (default: SOURCE.checkpoint; stdin has none)")
+    importer.add_argument("--dry-run", action="store_true",
+                          help="validate every row without writing anything")
+    importer.set_defaults(handler=cli_import)
+
+    backup = commands.add_parser("backup", help="write an incremental encrypted snapshot")
+    backup.add_argument("backup_dir")
+    backup.add_argument("--db", default=DB_FILE)
+    backup.add_argument("--full", action="store_true",
+                        help="start a new chain instead of diffing against the last snapshot")
+    backup.set_defaults(handler=cli_backup)
+
+    restore = commands.add_parser("restore", help="rebuild a database file from a snapshot")
+    restore.add_argument("backup_dir")
+    restore.add_argument("target", nargs="?", help="new database file to create")
+    restore.add_argument("--snapshot", type=int, help="snapshot id (default: latest)")
+    restore.add_argument("--list", action="store_true", help="list snapshots and exit")
+    restore.set_defaults(handler=cli_restore)
+
+    args = parser.parse_args(argv)
+    configure_logging()
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(cli_main())
@@ -0,0 +1,104 @@
+"""
+SecureVault — Secure Search UI
+Thin Streamlit client over the securevault engine. Run with
+`streamlit run securevault_ui.py` (or `streamlit run securevault.py`).
+"""
+
+import threading
+
+import streamlit as st
+from securevault import (
+    SEARCH_PAGE_SIZE, active_key_version, configure_logging, count_matches,
+    get_cipher, global_salt, init_db, insert_record, search_page
+)
+
+SEARCH_VIEW_TTL = 30
+
+
+@st.cache_resource(show_spinner=False)
+def vault():
+    """
+    One vault connection per process, shared by every session and rerun, so
+    the schema bootstrap and key derivation happen once. Script runs execute
+    on different threads; the lock keeps their transactions apart.
+    """
+    configure_logging()
+    conn = init_db(check_same_thread=False)
+    get_cipher(active_key_version())
+    global_salt()
+    return conn, threading.Lock()
+
+
+@st.cache_data(ttl=SEARCH_VIEW_TTL, show_spinner=False)
+def search_view(query: str, cursor, match: str) -> tuple:
+    conn, lock = vault()
+    with lock:
+        return search_page(conn, query, SEARCH_PAGE_SIZE, cursor, match)
+
+
+@st.cache_data(ttl=SEARCH_VIEW_TTL, show_spinner=False)
+def count_view(query: str, match: str) -> int:
+    conn, lock = vault()
+    with lock:
+        return count_matches(conn, query, match)
+
+
+def run_ui():
+    st.set_page_config(page_title="SecureVault Enterprise", layout="wide")
+    st.title("SecureVault Enterprise - Industry Grade Secure Search")
+
+    conn, lock = vault()
+
+    st.sidebar.header("Add Secure Record")
+
+    name = st.sidebar.text_input("Customer Name")
+    acc_no = st.sidebar.text_input("Account Number")
+    balance = st.sidebar.text_input("Balance")
+
+    if st.sidebar.button("Store Securely"):
+        try:
+            with lock:
+                insert_record(conn, {
+                    "name": name,
+                    "acc_no": acc_no,
+                    "balance": balance
+                })
+            search_view.clear()
+            count_view.clear()
+            st.success("Securely stored.")
+        except:
+            st.error("Account already exists.")
+
+    st.header("Secure Search")
+
+    query = st.text_input("Search by Name or Account Number")
+    match = st.radio("Match", ["all", "any"], horizontal=True,
+                     format_func=lambda m: "All terms" if m == "all" else "Any term")
+
+    if st.button("Search"):
+        st.session_state.sv_search = (query, match)
+        st.session_state.sv_cursors = [None]
+
+    if "sv_search" in st.session_state:
+        active_query, active_match = st.session_state.sv_search
+        cursors = st.session_state.sv_cursors
+        results, next_token = search_view(active_query, cursors[-1], active_match)
+        if results:
+            st.caption(f"{count_view(active_query, active_match):,} matching accounts")
+            for r in results:
+                st.json(r)
+
+            st.caption(f"Page {len(cursors)}")
+            prev_col, next_col = st.columns(2)
+            if len(cursors) > 1 and prev_col.button("Previous page"):
+                cursors.pop()
+                st.rerun()
+            if next_token and next_col.button("Next page"):
+                cursors.append(next_token)
+                st.rerun()
+        else:
+            st.error("No results found.")
+
+
+if __name__ == "__main__":
+    run_ui()
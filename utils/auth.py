@@ -5,6 +5,7 @@ Handles login, logout, session state, and credential verification.
 
 import streamlit as st
 from utils.db import get_user, hash_password, record_login, update_last_login
+from utils.resources import clear_read_views
 
 
 def init_session_state():
@@ -60,10 +61,12 @@ def login(username: str, password: str, role: str) -> bool:
         # Record successful login
         record_login(user["id"], username, role, "success")
         update_last_login(user["id"])
+        clear_read_views()
         return True
     else:
         # Record failed login attempt
         record_login(None, username, role, "failed")
+        clear_read_views()
         return False
 
 
@@ -7,67 +7,178 @@ import sqlite3
 import os
 import hashlib
 import secrets
+import queue
+import threading
+import time
+import atexit
+from contextlib import contextmanager
 from datetime import datetime
-
-AUTH_DB = os.path.join(os.path.dirname(os.path.dirname(__file__)), "securevault_auth.db")
-
-
-def get_connection():
-    """Get a database connection with Row factory."""
-    conn = sqlite3.connect(AUTH_DB)
-    conn.row_factory = sqlite3.Row
-    return conn
+from utils.storage import apply_storage_profile, start_checkpoint_scheduler
+
+# SECUREVAULT_AUTH_DB points the auth layer at another file (benchmarks and
+# scratch runs); it is read once, when the module's pools are created.
+AUTH_DB = os.environ.get("SECUREVAULT_AUTH_DB") or \
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "securevault_auth.db")
+
+POOL_SIZE = 8
+POOL_TIMEOUT = 5.0
+POOL_HEALTH_CHECK_AFTER = 30.0
+STATEMENT_CACHE_SIZE = 128
+
+
+# ─── Connection Pool ────────────────────────────────────────
+
+class ConnectionPool:
+    """
+    Thread-safe pool of SQLite connections.
+    Connections are opened lazily up to `size`, configured once with the
+    WAL storage profile (read-only when `read_only`), and keep their
+    prepared-statement cache between checkouts. A connection idle longer
+    than POOL_HEALTH_CHECK_AFTER is pinged before reuse and replaced if it
+    has gone bad.
+    """
+
+    def __init__(self, path: str, size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT,
+                 read_only: bool = False):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.read_only = read_only
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        conn.row_factory = sqlite3.Row
+        apply_storage_profile(conn, read_only=self.read_only)
+        return conn
+
+    def _is_healthy(self, conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self) -> sqlite3.Connection:
+        """Check out a connection, opening one if the pool is not yet full."""
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        try:
+            conn, idle_since = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    try:
+                        return self._open()
+                    except Exception:
+                        self._created -= 1
+                        raise
+            try:
+                conn, idle_since = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                raise TimeoutError("Timed out waiting for a database connection")
+
+        if time.monotonic() - idle_since > POOL_HEALTH_CHECK_AFTER and not self._is_healthy(conn):
+            conn.close()
+            conn = self._open()
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        """Return a connection to the pool, discarding any open transaction."""
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+            return
+        self._idle.put((conn, time.monotonic()))
+
+    @contextmanager
+    def connection(self):
+        """Context manager that checks a connection out and back in."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """Close every idle connection; checked-out ones close on release."""
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+
+
+# Writes (logins, seeding) go through a single writer connection; dashboard
+# reads use query_only connections. Under WAL, neither side blocks the other.
+_writer_pool = ConnectionPool(AUTH_DB, size=1)
+_reader_pool = ConnectionPool(AUTH_DB, read_only=True)
+atexit.register(_writer_pool.close)
+atexit.register(_reader_pool.close)
 
 
 def init_auth_db():
     """Initialize the authentication database with required tables."""
-    conn = get_connection()
-    c = conn.cursor()
-
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            password_salt TEXT NOT NULL,
-            email TEXT DEFAULT '',
-            full_name TEXT DEFAULT '',
-            role TEXT NOT NULL DEFAULT 'user',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_login TIMESTAMP,
-            two_fa_enabled INTEGER DEFAULT 0,
-            two_fa_secret TEXT DEFAULT NULL,
-            is_active INTEGER DEFAULT 1,
-            avatar_color TEXT DEFAULT '#00e5ff'
-        )
-    """)
-
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS login_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            username TEXT NOT NULL,
-            role TEXT NOT NULL,
-            login_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            ip_address TEXT DEFAULT '127.0.0.1',
-            status TEXT NOT NULL,
-            session_duration TEXT DEFAULT NULL,
-            FOREIGN KEY (user_id) REFERENCES users(id)
-        )
-    """)
+    with _writer_pool.connection() as conn:
+        c = conn.cursor()
+
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT UNIQUE NOT NULL,
+                password_hash TEXT NOT NULL,
+                password_salt TEXT NOT NULL,
+                email TEXT DEFAULT '',
+                full_name TEXT DEFAULT '',
+                role TEXT NOT NULL DEFAULT 'user',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_login TIMESTAMP,
+                two_fa_enabled INTEGER DEFAULT 0,
+                two_fa_secret TEXT DEFAULT NULL,
+                is_active INTEGER DEFAULT 1,
+                avatar_color TEXT DEFAULT '#00e5ff'
+            )
+        """)
+
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS login_logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                username TEXT NOT NULL,
+                role TEXT NOT NULL,
+                login_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                ip_address TEXT DEFAULT '127.0.0.1',
+                status TEXT NOT NULL,
+                session_duration TEXT DEFAULT NULL,
+                FOREIGN KEY (user_id) REFERENCES users(id)
+            )
+        """)
+
+        c.execute("""
+            CREATE INDEX IF NOT EXISTS idx_login_logs_time
+            ON login_logs(login_time DESC)
+        """)
 
-    c.execute("""
-        CREATE INDEX IF NOT EXISTS idx_login_logs_time
-        ON login_logs(login_time DESC)
-    """)
+        c.execute("""
+            CREATE INDEX IF NOT EXISTS idx_login_logs_user
+            ON login_logs(username)
+        """)
 
-    c.execute("""
-        CREATE INDEX IF NOT EXISTS idx_login_logs_user
-        ON login_logs(username)
-    """)
+        conn.commit()
 
-    conn.commit()
-    conn.close()
+    start_checkpoint_scheduler(AUTH_DB)
 
 
 def hash_password(password: str, salt: str = None) -> tuple:
@@ -85,9 +196,6 @@ def hash_password(password: str, salt: str = None) -> tuple:
 
 def seed_default_users():
     """Create default admin and user accounts if they don't exist."""
-    conn = get_connection()
-    c = conn.cursor()
-
     default_users = [
         {
             "username": "admin",
@@ -115,123 +223,125 @@ def seed_default_users():
         },
     ]
 
-    for user in default_users:
-        c.execute("SELECT id FROM users WHERE username = ?", (user["username"],))
-        if c.fetchone() is None:
-            pw_hash, salt = hash_password(user["password"])
-            c.execute(
-                """INSERT INTO users
-                   (username, password_hash, password_salt, email, full_name, role, avatar_color)
-                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
-                (user["username"], pw_hash, salt, user["email"],
-                 user["full_name"], user["role"], user["avatar_color"])
-            )
+    with _writer_pool.connection() as conn:
+        c = conn.cursor()
+
+        usernames = [user["username"] for user in default_users]
+        c.execute(
+            f"SELECT username FROM users WHERE username IN ({','.join('?' * len(usernames))})",
+            usernames
+        )
+        existing = {row[0] for row in c.fetchall()}
+        if len(existing) == len(usernames):
+            return
+
+        for user in default_users:
+            if user["username"] not in existing:
+                pw_hash, salt = hash_password(user["password"])
+                c.execute(
+                    """INSERT INTO users
+                       (username, password_hash, password_salt, email, full_name, role, avatar_color)
+                       VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                    (user["username"], pw_hash, salt, user["email"],
+                     user["full_name"], user["role"], user["avatar_color"])
+                )
 
-    conn.commit()
-    conn.close()
+        conn.commit()
 
 
 # ─── Query Functions ────────────────────────────────────────
 
 def get_user(username: str, role: str = None) -> dict | None:
     """Fetch a user by username (and optionally role). Returns dict or None."""
-    conn = get_connection()
-    c = conn.cursor()
-    if role:
-        c.execute("SELECT * FROM users WHERE username = ? AND role = ?", (username, role))
-    else:
-        c.execute("SELECT * FROM users WHERE username = ?", (username,))
-    row = c.fetchone()
-    conn.close()
+    with _reader_pool.connection() as conn:
+        c = conn.cursor()
+        if role:
+            c.execute("SELECT * FROM users WHERE username = ? AND role = ?", (username, role))
+        else:
+            c.execute("SELECT * FROM users WHERE username = ?", (username,))
+        row = c.fetchone()
     return dict(row) if row else None
 
 
 def get_all_users() -> list:
     """Fetch all users."""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("SELECT id, username, email, full_name, role, created_at, last_login, two_fa_enabled, is_active, avatar_color FROM users ORDER BY created_at DESC")
-    rows = c.fetchall()
-    conn.close()
+    with _reader_pool.connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT id, username, email, full_name, role, created_at, last_login, two_fa_enabled, is_active, avatar_color FROM users ORDER BY created_at DESC")
+        rows = c.fetchall()
     return [dict(r) for r in rows]
 
 
 def update_last_login(user_id: int):
     """Update the last_login timestamp for a user."""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("UPDATE users SET last_login = ? WHERE id = ?",
-              (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), user_id))
-    conn.commit()
-    conn.close()
+    with _writer_pool.connection() as conn:
+        c = conn.cursor()
+        c.execute("UPDATE users SET last_login = ? WHERE id = ?",
+                  (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), user_id))
+        conn.commit()
 
 
 def record_login(user_id: int, username: str, role: str, status: str, ip: str = "127.0.0.1"):
     """Record a login attempt in the login_logs table."""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute(
-        """INSERT INTO login_logs (user_id, username, role, login_time, ip_address, status)
-           VALUES (?, ?, ?, ?, ?, ?)""",
-        (user_id, username, role, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), ip, status)
-    )
-    conn.commit()
-    conn.close()
+    with _writer_pool.connection() as conn:
+        c = conn.cursor()
+        c.execute(
+            """INSERT INTO login_logs (user_id, username, role, login_time, ip_address, status)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (user_id, username, role, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), ip, status)
+        )
+        conn.commit()
 
 
 def get_login_logs(limit: int = 100) -> list:
     """Fetch recent login logs (for admin dashboard)."""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute(
-        "SELECT * FROM login_logs ORDER BY login_time DESC LIMIT ?", (limit,)
-    )
-    rows = c.fetchall()
-    conn.close()
+    with _reader_pool.connection() as conn:
+        c = conn.cursor()
+        c.execute(
+            "SELECT * FROM login_logs ORDER BY login_time DESC LIMIT ?", (limit,)
+        )
+        rows = c.fetchall()
     return [dict(r) for r in rows]
 
 
 def get_user_login_history(username: str, limit: int = 10) -> list:
     """Fetch login history for a specific user."""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute(
-        "SELECT * FROM login_logs WHERE username = ? ORDER BY login_time DESC LIMIT ?",
-        (username, limit)
-    )
-    rows = c.fetchall()
-    conn.close()
+    with _reader_pool.connection() as conn:
+        c = conn.cursor()
+        c.execute(
+            "SELECT * FROM login_logs WHERE username = ? ORDER BY login_time DESC LIMIT ?",
+            (username, limit)
+        )
+        rows = c.fetchall()
     return [dict(r) for r in rows]
 
 
 def get_login_stats() -> dict:
     """Get aggregate login statistics for admin dashboard."""
-    conn = get_connection()
-    c = conn.cursor()
-
-    c.execute("SELECT COUNT(*) FROM users")
-    total_users = c.fetchone()[0]
+    with _reader_pool.connection() as conn:
+        c = conn.cursor()
 
-    c.execute("SELECT COUNT(*) FROM users WHERE role = 'user'")
-    total_regular = c.fetchone()[0]
+        c.execute("SELECT COUNT(*) FROM users")
+        total_users = c.fetchone()[0]
 
-    c.execute("SELECT COUNT(*) FROM login_logs")
-    total_logins = c.fetchone()[0]
+        c.execute("SELECT COUNT(*) FROM users WHERE role = 'user'")
+        total_regular = c.fetchone()[0]
 
-    c.execute("SELECT COUNT(*) FROM login_logs WHERE status = 'success'")
-    successful = c.fetchone()[0]
+        c.execute("SELECT COUNT(*) FROM login_logs")
+        total_logins = c.fetchone()[0]
 
-    c.execute("SELECT COUNT(*) FROM login_logs WHERE status = 'failed'")
-    failed = c.fetchone()[0]
+        c.execute("SELECT COUNT(*) FROM login_logs WHERE status = 'success'")
+        successful = c.fetchone()[0]
 
-    c.execute("""
-        SELECT COUNT(DISTINCT username) FROM login_logs
-        WHERE status = 'success'
-        AND login_time >= datetime('now', '-24 hours')
-    """)
-    active_24h = c.fetchone()[0]
+        c.execute("SELECT COUNT(*) FROM login_logs WHERE status = 'failed'")
+        failed = c.fetchone()[0]
 
-    conn.close()
+        c.execute("""
+            SELECT COUNT(DISTINCT username) FROM login_logs
+            WHERE status = 'success'
+            AND login_time >= datetime('now', '-24 hours')
+        """)
+        active_24h = c.fetchone()[0]
 
     return {
         "total_users": total_users,
@@ -0,0 +1,234 @@
+"""
+SecureVault — Latency Metrics
+In-process latency histograms and counters, dumped as JSON or scraped as
+plain text from a local HTTP endpoint. Nothing is timed until functions are
+wrapped with instrument(); unwrapped code pays no cost at all.
+"""
+
+import json
+import re
+import threading
+import time
+from functools import wraps
+
+SUB_BUCKET_BITS = 6
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9464
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+# ─── Histogram ──────────────────────────────────────────────
+
+class LatencyHistogram:
+    """
+    HDR-style log-linear histogram of nanosecond values. Each power of two is
+    split into 2**(SUB_BUCKET_BITS - 1) linear buckets, which bounds the
+    relative error of any reported percentile to about 3% with a few hundred
+    buckets covering nanoseconds to hours.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    @staticmethod
+    def _bucket(value: int) -> int:
+        shift = max(0, value.bit_length() - SUB_BUCKET_BITS)
+        return (shift << SUB_BUCKET_BITS) | (value >> shift)
+
+    @staticmethod
+    def _bucket_upper(bucket: int) -> int:
+        shift = bucket >> SUB_BUCKET_BITS
+        base = bucket & ((1 << SUB_BUCKET_BITS) - 1)
+        return ((base + 1) << shift) - 1
+
+    def record(self, value: int):
+        bucket = self._bucket(value)
+        with self._lock:
+            self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+            self.count += 1
+            self.total += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, pct: float) -> int:
+        """Upper bound of the bucket holding the pct-th percentile value."""
+        with self._lock:
+            if not self.count:
+                return 0
+            rank = max(1, round(pct / 100 * self.count))
+            seen = 0
+            for bucket in sorted(self._buckets):
+                seen += self._buckets[bucket]
+                if seen >= rank:
+                    return min(self._bucket_upper(bucket), self.max)
+            return self.max
+
+    def to_dict(self) -> dict:
+        """Summary in microseconds."""
+        summary = {
+            "count": self.count,
+            "sum_us": round(self.total / 1e3, 3),
+            "min_us": round((self.min or 0) / 1e3, 3),
+            "max_us": round(self.max / 1e3, 3),
+        }
+        for pct in PERCENTILES:
+            summary[f"p{pct:g}_us"] = round(self.percentile(pct) / 1e3, 3)
+        return summary
+
+
+# ─── Registry ───────────────────────────────────────────────
+
+class MetricsRegistry:
+    """Named histograms and counters, plus collectors polled on export."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.collectors = []
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, LatencyHistogram())
+        return histogram
+
+    def increment(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_collector(self, collector):
+        """Register a callable returning {name: number} gauges."""
+        self.collectors.append(collector)
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
+
+    def snapshot(self) -> dict:
+        gauges = {}
+        for collector in self.collectors:
+            gauges.update(collector())
+        return {
+            "histograms": {name: h.to_dict() for name, h in sorted(self.histograms.items())},
+            "counters": dict(sorted(self.counters.items())),
+            "gauges": dict(sorted(gauges.items())),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_text(self, prefix: str = "securevault") -> str:
+        """Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = [f"# TYPE {prefix}_latency_seconds summary"]
+        for name, h in snapshot["histograms"].items():
+            label = f'op="{name}"'
+            for pct in PERCENTILES:
+                lines.append(f'{prefix}_latency_seconds{{{label},quantile="{pct / 100:g}"}} '
+                             f'{h[f"p{pct:g}_us"] / 1e6:.9f}')
+            lines.append(f"{prefix}_latency_seconds_sum{{{label}}} {h['sum_us'] / 1e6:.9f}")
+            lines.append(f"{prefix}_latency_seconds_count{{{label}}} {h['count']}")
+        for kind in ("counters", "gauges"):
+            for name, value in snapshot[kind].items():
+                lines.append(f"{prefix}_{_metric_name(name)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+registry = MetricsRegistry()
+
+
+# ─── Instrumentation ────────────────────────────────────────
+
+def timed(fn, name: str, metrics: MetricsRegistry = None):
+    """Wrap fn so every call is recorded in the `name` histogram."""
+    histogram = (metrics or registry).histogram(name)
+    clock = time.perf_counter_ns
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = clock()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            histogram.record(clock() - start)
+
+    # lru_cache helpers live on the wrapper object, not in its __dict__.
+    for attr in ("cache_clear", "cache_info"):
+        if hasattr(fn, attr):
+            setattr(wrapper, attr, getattr(fn, attr))
+    return wrapper
+
+
+def instrument(namespace: dict, targets: dict, metrics: MetricsRegistry = None):
+    """
+    Replace the functions named in `targets` ({function name: metric name})
+    inside `namespace` (a module's globals()) with timed wrappers. Callers
+    that look the function up as a global pick up the wrapper immediately.
+    """
+    for fn_name, metric in targets.items():
+        fn = namespace[fn_name]
+        if not hasattr(fn, "__instrumented__"):
+            wrapper = timed(fn, metric, metrics)
+            wrapper.__instrumented__ = fn
+            namespace[fn_name] = wrapper
+
+
+def uninstrument(namespace: dict, targets: dict):
+    """Put back the original functions replaced by instrument()."""
+    for fn_name in targets:
+        original = getattr(namespace[fn_name], "__instrumented__", None)
+        if original is not None:
+            namespace[fn_name] = original
+
+
+# ─── Text Endpoint ──────────────────────────────────────────
+
+def serve_metrics(metrics: MetricsRegistry = None, host: str = METRICS_HOST,
+                  port: int = METRICS_PORT):
+    """
+    Serve GET /metrics (text) and GET /metrics.json from a daemon thread.
+    Binds to localhost by default; call shutdown() on the result to stop.
+    """
+    # Imported here so loading the metrics module stays cheap.
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    metrics = metrics or registry
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, content_type = metrics.to_text(), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, content_type = metrics.to_json(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            payload = body.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-endpoint",
+                     daemon=True).start()
+    return server
@@ -0,0 +1,48 @@
+"""
+SecureVault — Streamlit Resources
+Process-wide cached resources shared by every session and rerun: a run-once
+auth database bootstrap and short-lived cached dashboard read views.
+"""
+
+import streamlit as st
+from utils import db
+
+READ_VIEW_TTL = 15
+
+
+# ─── Run-Once Bootstrap ─────────────────────────────────────
+
+@st.cache_resource(show_spinner=False)
+def bootstrap_auth_db() -> bool:
+    """Create the auth schema and default accounts once per process."""
+    db.init_auth_db()
+    db.seed_default_users()
+    return True
+
+
+# ─── Cached Read Views ──────────────────────────────────────
+
+@st.cache_data(ttl=READ_VIEW_TTL, show_spinner=False)
+def login_stats() -> dict:
+    return db.get_login_stats()
+
+
+@st.cache_data(ttl=READ_VIEW_TTL, show_spinner=False)
+def login_logs(limit: int = 100) -> list:
+    return db.get_login_logs(limit)
+
+
+@st.cache_data(ttl=READ_VIEW_TTL, show_spinner=False)
+def all_users() -> list:
+    return db.get_all_users()
+
+
+@st.cache_data(ttl=READ_VIEW_TTL, show_spinner=False)
+def user_login_history(username: str, limit: int = 10) -> list:
+    return db.get_user_login_history(username, limit)
+
+
+def clear_read_views():
+    """Drop every cached view, e.g. after a login has been recorded."""
+    for view in (login_stats, login_logs, all_users, user_login_history):
+        view.clear()
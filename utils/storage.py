@@ -0,0 +1,114 @@
+"""
+SecureVault — SQLite Storage Profile
+WAL-mode connection tuning shared by the vault and auth databases, plus a
+background checkpoint scheduler that keeps each write-ahead log bounded.
+"""
+
+import os
+import sqlite3
+import threading
+import logging
+
+CACHE_SIZE_KB = 16_000
+MMAP_SIZE = 256 * 1024 * 1024
+BUSY_TIMEOUT_MS = 5000
+WAL_SIZE_LIMIT = 64 * 1024 * 1024
+
+CHECKPOINT_INTERVAL = 30.0
+CHECKPOINT_TRUNCATE_AT = 16 * 1024 * 1024
+TRUNCATE_BUSY_TIMEOUT_MS = 10
+
+STORAGE_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    # In WAL mode NORMAL only fsyncs at checkpoints; committed transactions
+    # survive an application crash, only power loss can drop the last few.
+    "PRAGMA synchronous = NORMAL",
+    f"PRAGMA cache_size = -{CACHE_SIZE_KB}",
+    f"PRAGMA mmap_size = {MMAP_SIZE}",
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+    f"PRAGMA journal_size_limit = {WAL_SIZE_LIMIT}",
+    "PRAGMA temp_store = MEMORY",
+]
+
+READER_PRAGMAS = STORAGE_PRAGMAS + ["PRAGMA query_only = ON"]
+
+
+def apply_storage_profile(conn: sqlite3.Connection, read_only: bool = False):
+    """Apply the WAL storage profile to an open connection."""
+    for pragma in (READER_PRAGMAS if read_only else STORAGE_PRAGMAS):
+        conn.execute(pragma)
+
+
+# ─── Checkpoint Scheduler ───────────────────────────────────
+
+class CheckpointScheduler:
+    """
+    Periodically checkpoints a WAL database from a daemon thread.
+    A PASSIVE checkpoint never waits on readers or writers. Once the WAL
+    has been fully backfilled and is larger than CHECKPOINT_TRUNCATE_AT, a
+    TRUNCATE checkpoint resets it to zero bytes. TRUNCATE holds the write
+    lock while it waits for readers, so it only gets a short busy timeout
+    and is simply retried on the next pass.
+    """
+
+    def __init__(self, path: str, interval: float = CHECKPOINT_INTERVAL,
+                 truncate_at: int = CHECKPOINT_TRUNCATE_AT):
+        self.path = path
+        self.interval = interval
+        self.truncate_at = truncate_at
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            name=f"checkpoint-{os.path.basename(path)}",
+            daemon=True,
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def checkpoint(self, conn: sqlite3.Connection) -> tuple:
+        """Run one checkpoint. Returns (busy, wal_pages, checkpointed_pages)."""
+        result = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        _, wal_pages, checkpointed = result
+        wal_path = self.path + "-wal"
+        wal_bytes = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+        if wal_bytes <= self.truncate_at or wal_pages != checkpointed:
+            return result
+
+        conn.execute(f"PRAGMA busy_timeout = {TRUNCATE_BUSY_TIMEOUT_MS}")
+        try:
+            return conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        finally:
+            conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+
+    def _run(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        try:
+            apply_storage_profile(conn)
+            while not self._stop.wait(self.interval):
+                try:
+                    self.checkpoint(conn)
+                except sqlite3.Error as e:
+                    logging.warning(f"WAL checkpoint failed for {self.path}: {e}")
+        finally:
+            conn.close()
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def start_checkpoint_scheduler(path: str) -> CheckpointScheduler:
+    """Start (once per process and database file) a checkpoint scheduler."""
+    key = os.path.abspath(path)
+    with _schedulers_lock:
+        scheduler = _schedulers.get(key)
+        if scheduler is None:
+            scheduler = CheckpointScheduler(path)
+            scheduler.start()
+            _schedulers[key] = scheduler
+    return scheduler